@@ -0,0 +1,197 @@
+#CS486 Assignment #2: Benchmark runner for the TSP solvers
+
+#Purpose: Run the solvers over every instance in the randTSP corpus and record how they did.
+#For each instance and solver we record the wall time, the nodes generated, the tour cost
+#and the gap to the optimal cost (taken from the exact solvers run on that instance).
+#Results are written to CSV or JSON, and can be compared against an earlier run to flag slowdowns.
+
+#Usage: python Benchmark.py [--root randTSP] [--sizes 1-12] [--solvers astar,heldkarp,anneal]
+#                           [--output results.json] [--compare previous.json] [--threshold 0.25]
+#                           [--min-time S] [--workers N] [--timeout S]
+
+import sys, os, re, csv, json, glob, argparse, time
+from ParallelSolve import SOLVERS, TimedCall, SolveInParallel
+
+#Exact solvers give the optimal cost that the other solvers are compared against
+EXACT_SOLVERS = ["astar", "bnb", "heldkarp"]
+
+#Wall times (in seconds) below which a slowdown is put down to timer noise and not flagged
+MIN_TIME = 0.05
+
+#Columns of a result, in the order they are written out
+FIELDS = ["instance", "cities", "solver", "status", "nodes", "cost", "time", "wall", "gap"]
+
+#FindInstances: All instance files under root/<n>/instance_*.txt for the given sizes,
+#ordered by size and then by instance number
+def FindInstances(root, sizes):
+	instances = []
+	for size in sizes:
+		files = glob.glob(os.path.join(root, str(size), "instance_*.txt"))
+		files.sort(key=lambda f: int(re.findall(r"\d+", os.path.basename(f))[0]))
+		instances.extend((size, f) for f in files)
+	return instances
+
+#ParseSizes: Turn "1-12" or "4,8,16" into a list of sizes
+def ParseSizes(text):
+	sizes = []
+	for part in text.split(","):
+		if "-" in part:
+			low, high = part.split("-")
+			sizes.extend(range(int(low), int(high)+1))
+		else:
+			sizes.append(int(part))
+	return sizes
+
+#RunSolver: Run one solver on one instance file, timing it from the outside as well
+def RunSolver(solver, filename):
+	function, extra = SOLVERS[solver]
+
+	starttime = time.perf_counter()
+	result = function(filename, *extra)
+	result["wall"] = time.perf_counter() - starttime
+	return result
+
+#Benchmark: Run every solver over every instance, filling in the optimality gaps once
+#all solvers have finished with an instance. With more than one worker the runs are
+#spread over a process pool; each run is stopped after timeout seconds if one is given.
+def Benchmark(instances, solvers, workers=1, timeout=None):
+	tasks = [(solver, filename) for size, filename in instances for solver in solvers]
+	if workers == 1:
+		outcomes = [TimedCall(RunSolver, task, timeout) for task in tasks]
+	else:
+		outcomes = SolveInParallel(RunSolver, tasks, workers, timeout)
+	outcomes = dict(zip(tasks, outcomes))
+
+	results = []
+	for size, filename in instances:
+		instanceResults = []
+		for solver in solvers:
+			status, result = outcomes[(solver, filename)]
+			if status != "ok":
+				result = {"nodes": None, "cost": None, "time": None, "wall": None}
+			result.update({"instance": filename, "cities": size, "solver": solver, "status": status, "gap": None})
+			instanceResults.append(result)
+			if status == "ok":
+				print("{} {}: cost {}, nodes {}, {:.4f} seconds".format(filename, solver, result["cost"], result["nodes"], result["wall"]))
+			else:
+				print("{} {}: {}".format(filename, solver, status.upper()))
+
+		exactCosts = [r["cost"] for r in instanceResults if r["solver"] in EXACT_SOLVERS and r["cost"] is not None]
+		if exactCosts:
+			optimal = min(exactCosts)
+			for r in instanceResults:
+				if r["cost"] is not None:
+					r["gap"] = (r["cost"] - optimal) / optimal if optimal > 0 else 0.0
+
+		results.extend(instanceResults)
+	return results
+
+#WriteResults: Save results as JSON or CSV, depending on the file extension
+def WriteResults(results, filename):
+	with open(filename, "w", newline="") as output:
+		if filename.endswith(".json"):
+			json.dump(results, output, indent=1)
+		else:
+			writer = csv.DictWriter(output, fieldnames=FIELDS)
+			writer.writeheader()
+			for result in results:
+				writer.writerow({f: result.get(f) for f in FIELDS})
+
+#ReadResults: Load results saved by WriteResults
+def ReadResults(filename):
+	with open(filename, "r", newline="") as saved:
+		if filename.endswith(".json"):
+			return json.load(saved)
+
+		results = []
+		for row in csv.DictReader(saved):
+			for f in ["nodes", "cities"]:
+				row[f] = int(row[f]) if row[f] else None
+			for f in ["cost", "time", "wall", "gap"]:
+				row[f] = float(row[f]) if row[f] else None
+			results.append(row)
+		return results
+
+#FindRegressions: Compare results against a previous run. A result has regressed if its wall time
+#grew by more than threshold (as a fraction), or if it generated more nodes or found a worse tour
+#than before. Annealing is randomized, so only its time is compared. Runs that took less than
+#minTime seconds both times are too short to time reliably, so their wall times are not compared.
+def FindRegressions(results, previous, threshold, minTime=MIN_TIME):
+	previousResults = {(r["instance"], r["solver"]): r for r in previous}
+	regressions = []
+
+	for result in results:
+		key = (result["instance"], result["solver"])
+		if key not in previousResults:
+			continue
+		before = previousResults[key]
+		if before.get("status", "ok") != "ok":
+			continue
+		if result["status"] != "ok":
+			regressions.append((key, [result["status"]]))
+			continue
+
+		reasons = []
+		slow = max(before["wall"] or 0, result["wall"]) >= minTime
+		if before["wall"] and slow and result["wall"] > before["wall"] * (1 + threshold):
+			reasons.append("wall time {:.4f}s -> {:.4f}s".format(before["wall"], result["wall"]))
+		if result["solver"] in EXACT_SOLVERS:
+			if before["nodes"] is not None and result["nodes"] is not None and result["nodes"] > before["nodes"]:
+				reasons.append("nodes {} -> {}".format(before["nodes"], result["nodes"]))
+			if before["cost"] is not None and result["cost"] is not None and result["cost"] > before["cost"] + 1e-9:
+				reasons.append("cost {} -> {}".format(before["cost"], result["cost"]))
+
+		if reasons:
+			regressions.append((key, reasons))
+	return regressions
+
+#Summarize: Average wall time and gap per solver and size, to show how each solver scales
+def Summarize(results):
+	groups = {}
+	for r in results:
+		groups.setdefault((r["solver"], r["cities"]), []).append(r)
+
+	print('\n' + "Solver     Cities  Instances  Mean wall (s)  Mean gap")
+	for (solver, size), group in sorted(groups.items()):
+		finished = [r["wall"] for r in group if r["wall"] is not None]
+		wall = sum(finished) / len(finished) if finished else float("nan")
+		gaps = [r["gap"] for r in group if r["gap"] is not None]
+		gap = "{:.2%}".format(sum(gaps) / len(gaps)) if gaps else "-"
+		print("{:<10} {:>6}  {:>9}  {:>13.4f}  {:>8}".format(solver, size, len(group), wall, gap))
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark the TSP solvers over the randTSP corpus")
+	parser.add_argument("--root", default="randTSP", help="folder holding <n>/instance_*.txt")
+	parser.add_argument("--sizes", default="1-12", help="city counts to run, e.g. 1-12 or 4,8,16")
+	parser.add_argument("--solvers", default="astar,heldkarp,anneal", help="comma separated: " + ",".join(SOLVERS))
+	parser.add_argument("--output", default="results.csv", help="where to save results (.csv or .json)")
+	parser.add_argument("--compare", help="previous results to check for regressions")
+	parser.add_argument("--threshold", type=float, default=0.25, help="allowed fractional slowdown before flagging")
+	parser.add_argument("--min-time", type=float, default=MIN_TIME, help="wall times in seconds too short to flag as slowdowns")
+	parser.add_argument("--workers", type=int, default=1, help="worker processes to run instances on")
+	parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per solver run")
+	args = parser.parse_args()
+
+	solvers = args.solvers.split(",")
+	for solver in solvers:
+		if solver not in SOLVERS:
+			parser.error("unknown solver: {}".format(solver))
+
+	instances = FindInstances(args.root, ParseSizes(args.sizes))
+	if not instances:
+		parser.error("no instances found under {}".format(args.root))
+
+	results = Benchmark(instances, solvers, args.workers, args.timeout)
+	WriteResults(results, args.output)
+	Summarize(results)
+
+	if args.compare:
+		regressions = FindRegressions(results, ReadResults(args.compare), args.threshold, args.min_time)
+		for (instance, solver), reasons in regressions:
+			print("REGRESSION {} {}: {}".format(instance, solver, "; ".join(reasons)))
+		if regressions:
+			sys.exit(1)
+		print("No regressions against {}".format(args.compare))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,205 @@
+#CS486 Assignment #2: Construction heuristics for TSP
+
+#Purpose: Build a reasonable tour quickly, to start annealing or local search from instead
+#of a random tour, or to give the exact solvers a first tour to beat.
+#	Nearest neighbour: always move on to the closest unvisited city
+#	Greedy edge: add the cheapest edges that keep every city at degree 2 or less without
+#	closing a cycle early, then join the fragments
+#	Space-filling curve: visit the cities in the order they fall along a Hilbert curve
+#	Christofides-lite: Christofides' algorithm with a greedy matching of the odd-degree cities
+#	in place of a minimum weight perfect matching
+#Every heuristic returns a Tour that starts and ends at the first city, and leaves the list
+#of cities it is given unchanged. All but Christofides work without a DistanceMatrix.
+
+from TSPObjects import *
+
+#Number of nearest neighbours each city offers as candidate edges to GreedyEdgeTour
+GREEDY_NEIGHBOURS = 10
+
+#Bits per coordinate of the Hilbert curve grid used by SpaceFillingCurveTour
+HILBERT_ORDER = 16
+
+#PathTour: The Tour visiting the cities in path, then returning to the first of them
+def PathTour(path):
+	tour = Tour()
+	for city in path:
+		tour.AddCity(city)
+	tour.AddCity(path[0])
+	return tour
+
+#StartAt: The cities in order, rotated so that start is first
+def StartAt(order, start):
+	i = order.index(start)
+	return order[i:] + order[:i]
+
+#NearestNeighbourTour: Start at the first city and keep moving to the closest unvisited one. O(n^2).
+def NearestNeighbourTour(cities):
+	path = [cities[0]]
+	unvisited = list(cities[1:])
+	while unvisited:
+		current = path[-1]
+		nearest = min(range(len(unvisited)), key=lambda i: Distance(current, unvisited[i]))
+		path.append(unvisited[nearest])
+
+		#Move the last city into the gap left by the one we took
+		unvisited[nearest] = unvisited[-1]
+		unvisited.pop()
+
+	return PathTour(path)
+
+#FindRoot: The representative of a city's fragment, for the union-find in GreedyEdgeTour
+def FindRoot(roots, i):
+	while roots[i] != i:
+		roots[i] = roots[roots[i]]
+		i = roots[i]
+	return i
+
+#GreedyEdgeTour: Take candidate edges cheapest first, keeping each one that leaves both of its
+#cities with at most two edges and does not close a cycle. Candidates are the edges to each city's
+#nearest neighbours (see NearestNeighbourLists), and cities are known by their position in the list.
+#The fragments left over are joined end to end, each time to the fragment with the closest end.
+def GreedyEdgeTour(cities, k=GREEDY_NEIGHBOURS):
+	if len(cities) <= 3:
+		return PathTour(list(cities))
+
+	cities = list(cities)
+	n = len(cities)
+	neighbours = NearestNeighbourLists(cities, min(k, n-1))
+	candidates = {(min(i, j), max(i, j)) for i in range(0, n) for j in neighbours[i]}
+	edges = sorted((Distance(cities[i], cities[j]), i, j) for i, j in candidates)
+
+	links = [[] for i in range(0, n)]
+	roots = list(range(0, n))
+	for cost, i, j in edges:
+		if len(links[i]) < 2 and len(links[j]) < 2:
+			rootI = FindRoot(roots, i)
+			rootJ = FindRoot(roots, j)
+			if rootI != rootJ:
+				roots[rootI] = rootJ
+				links[i].append(j)
+				links[j].append(i)
+
+	#Walk each fragment from one of its ends
+	fragments = []
+	seen = [False] * n
+	for i in range(0, n):
+		if seen[i] or len(links[i]) == 2:
+			continue
+		fragment = [i]
+		seen[i] = True
+		while True:
+			following = [j for j in links[fragment[-1]] if not seen[j]]
+			if not following:
+				break
+			fragment.append(following[0])
+			seen[following[0]] = True
+		fragments.append(fragment)
+
+	#Join the fragments, always to the closest free end
+	order = fragments.pop()
+	while fragments:
+		end = order[-1]
+		best = min(range(len(fragments)), key=lambda f: min(Distance(cities[end], cities[fragments[f][0]]), Distance(cities[end], cities[fragments[f][-1]])))
+		fragment = fragments[best]
+		fragments[best] = fragments[-1]
+		fragments.pop()
+		if Distance(cities[end], cities[fragment[-1]]) < Distance(cities[end], cities[fragment[0]]):
+			fragment.reverse()
+		order.extend(fragment)
+
+	return PathTour(StartAt([cities[i] for i in order], cities[0]))
+
+#HilbertIndex: How far along a Hilbert curve over a side x side grid the point (x, y) is,
+#where side is a power of 2
+def HilbertIndex(x, y, side):
+	d = 0
+	s = side // 2
+	while s > 0:
+		rx = 1 if x & s else 0
+		ry = 1 if y & s else 0
+		d += s * s * ((3 * rx) ^ ry)
+
+		#Rotate the quadrant so the curve inside it has the standard orientation
+		if ry == 0:
+			if rx == 1:
+				x = side - 1 - x
+				y = side - 1 - y
+			x, y = y, x
+		s = s // 2
+	return d
+
+#SpaceFillingCurveTour: Visit the cities in the order of a Hilbert curve through their
+#bounding box. Cities close together on the curve are close together in the plane, so the
+#tour is reasonable, and it only takes O(n log n) with no distance lookups.
+def SpaceFillingCurveTour(cities):
+	side = 1 << HILBERT_ORDER
+	minX = min(city.x for city in cities)
+	minY = min(city.y for city in cities)
+	extent = max(max(city.x for city in cities) - minX, max(city.y for city in cities) - minY) or 1
+	scale = (side - 1) / extent
+
+	order = sorted(cities, key=lambda city: HilbertIndex(int((city.x - minX) * scale), int((city.y - minY) * scale), side))
+	return PathTour(StartAt(order, cities[0]))
+
+#ChristofidesTour: Christofides' algorithm with a greedy matching. Build the MST, pair up the
+#cities with an odd number of tree edges (cheapest pairs first), follow an Euler circuit of the
+#tree plus the matching, and skip cities that have already been visited.
+#A minimum weight matching would guarantee a tour within 1.5 times the optimal cost; the greedy
+#one doesn't, but is much simpler and does about as well in practice. Needs a DistanceMatrix. O(n^2 log n).
+def ChristofidesTour(cities):
+	if len(cities) <= 3:
+		return PathTour(list(cities))
+
+	matrix = cities[0].matrix
+	if matrix is None:
+		raise ValueError("christofides needs a distance matrix, and there are too many cities for one ({})".format(len(cities)))
+	n = matrix.size
+	costs = matrix.costs
+
+	#The minimum spanning tree, as the edges from each city to its parent
+	links = [[] for i in range(0, n)]
+	treeCost, parents = matrix.PrimTree(list(range(0, n)))
+	for i in range(1, n):
+		links[i].append(parents[i])
+		links[parents[i]].append(i)
+
+	#Greedy matching of the odd-degree cities
+	odd = [i for i in range(0, n) if len(links[i]) % 2 == 1]
+	pairs = sorted((costs[odd[a]][odd[b]], odd[a], odd[b]) for a in range(0, len(odd)) for b in range(a+1, len(odd)))
+	matched = set()
+	for cost, i, j in pairs:
+		if i not in matched and j not in matched:
+			matched.add(i)
+			matched.add(j)
+			links[i].append(j)
+			links[j].append(i)
+
+	#Euler circuit (Hierholzer's algorithm), keeping each city the first time it comes up
+	start = cities[0].index
+	stack = [start]
+	circuit = []
+	while stack:
+		i = stack[-1]
+		if links[i]:
+			j = links[i].pop()
+			links[j].remove(i)
+			stack.append(j)
+		else:
+			circuit.append(stack.pop())
+
+	seen = set()
+	order = []
+	for i in reversed(circuit):
+		if i not in seen:
+			seen.add(i)
+			order.append(matrix.cities[i])
+
+	return PathTour(StartAt(order, cities[0]))
+
+#Construction heuristics by name
+CONSTRUCTIONS = {
+	"nn": NearestNeighbourTour,
+	"greedy": GreedyEdgeTour,
+	"sfc": SpaceFillingCurveTour,
+	"christofides": ChristofidesTour,
+}
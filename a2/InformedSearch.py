@@ -10,68 +10,32 @@
 #Heuristic: We will use the minimum spanning tree (MST) with the lowest cost.
 #Cost: Cost of the path between two cities is the euclidean distance.
 
-import sys, string, math, queue, datetime, heapq
+import sys, string, math, datetime, time, heapq, array
 from TSPObjects import *
+from TSPLoader import LoadCities, MATRIX_LIMIT
+from SolverMetrics import ParseMetricsArguments, RunProfiled
+from LowerBound import HeldKarpBound, PathBound
+from Construction import NearestNeighbourTour
 
 #Helpers
 #Calculates the total cost of the path
 def CalculatePathCost(path):
 	pathcost = 0
 	for i in range(1, len(path)):
-		pathcost = pathcost + EuclideanCost(path[i], path[i-1])
+		pathcost = pathcost + Distance(path[i], path[i-1])
 
 	return pathcost
 
-#Minimum Spanning Tree
-##################################################
-#MinimumCostRoad: Given the visited cities, all roads and the current MST,
-#find the lowest cost road that has one end in a visited city and one end in an univisted city
-def MinimumCostRoad(visitedCities, roads, mst):
-	for road in roads:
-		if road not in mst:
-			if (road.source not in visitedCities) and (road.dest in visitedCities):
-				mst.append(road)
-				visitedCities.append(road.source)
-				return road.cost
-			elif (road.dest not in visitedCities) and (road.source in visitedCities):
-				mst.append(road)
-				visitedCities.append(road.dest)
-				return road.cost
-	return 0
-
-#PrimMST: Construct the MST of unvisited cities using Prim's algorithm,
-#returning the cost to traverse that tree
-def PrimMST(cities):
-	if len(cities) <= 1:
-		return 0
-
-	roads = ConstructRoads(cities)
-	firstRoad = roads.pop(0)
-	mst = [firstRoad]
-
-	visitedCities = [firstRoad.source, firstRoad.dest]
-	mstCost = firstRoad.cost
-
-	while len(visitedCities) < len(cities):
-		mstCost = mstCost + MinimumCostRoad(visitedCities, roads, mst)
-
-	return mstCost
-
 #A* Search 
 ########################################################
-#FindUnvisitedCities: Given a path and a list of cities, return a list
-#of all cities not in the path
-def FindUnvisitedCities(path, cities):
-	unvisitedCities = []
+#FindUnvisitedCities: Given a node, return the bitmask of all cities not in its path
+def FindUnvisitedCities(node, matrix):
+	unvisitedCities = matrix.full & ~node.visited
 
 	#If our path is not finished (a cycle), add the first city in the path
 	#because we need to go back there
-	if (len(path) > 1 and path[0] != path[-1]):
-		unvisitedCities.append(path[0])
-
-	for city in cities:
-		if not city in path:
-			unvisitedCities.append(city)
+	if node.depth > 1 and not node.IsCycle():
+		unvisitedCities = unvisitedCities | (1 << node.start.index)
 
 	return unvisitedCities
 
@@ -79,73 +43,367 @@ def FindUnvisitedCities(path, cities):
 #We notice that the MST cost and Pathcost are the same for every succcessor of <node>.
 #We can compute these only once and perform the f(n) calculation in this function
 #f(n) contains the cost of the path so far, as well as the heurisitic (cost of MST) + cost to child
-def FindSuccessors(node, cities):
+#If neighbours (nearest neighbour lists by city index) are given, only the unvisited neighbours
+#of the current city are successors, unless none of them are left. The search is then no longer exact.
+#If bound (a PathBound) is given, each successor's heuristic is the larger of the MST and the
+#Held-Karp path bound from that successor through the unvisited cities back to the start.
+def FindSuccessors(node, cities, neighbours=None, bound=None):
 	successors = []
 
 	#We return an empty list if the path contains a cycle (we are done)
-	if len(node.path) > 1 and (node.path[0] == node.path[-1]):
+	if node.IsCycle():
 		return successors
 
 	#Precompute static costs
-	#Compute the cost of the current path
-	pathcost = CalculatePathCost(node.path)
+	#The cost of the current path is carried on the node
+	pathcost = node.g
 
 	#Compute the cost of the mst of all unvisited cities
-	unvisitedCities = FindUnvisitedCities(node.path, cities)
-	mstcost = PrimMST(unvisitedCities)
+	matrix = node.city.matrix
+	mstcost = matrix.MSTCost(FindUnvisitedCities(node, matrix))
+	if bound is not None:
+		#The path bound is the tree bound plus the penalties of the path's two ends:
+		#the start, added here, and the successor, added below
+		remaining = (matrix.full & ~node.visited) | (1 << node.start.index)
+		treeBound = bound.TreeBound(remaining) + bound.penalties[node.start.index]
 	########################################################
 
+	#Only look at the current city's nearest neighbours, if any are still unvisited
+	candidates = cities
+	if neighbours is not None:
+		nearby = [cities[i] for i in neighbours[node.city.index] if not (node.visited >> i) & 1]
+		if nearby:
+			candidates = nearby
+
 	#Skip all cities in the path, add the ones that are not as successors
-	for city in cities:
-		if city not in node.path:
-			nPath = list(node.path)
-			nPath.append(city)
-			f = pathcost + mstcost + EuclideanCost(node.path[-1], city)
-			successors.append(CostTuple(f, nPath))
+	for city in candidates:
+		if not (node.visited >> city.index) & 1:
+			g = pathcost + Distance(node.city, city)
+			f = g + mstcost
+			if bound is not None:
+				f = g + max(mstcost, treeBound + bound.penalties[city.index])
+			successors.append(CostTuple(f, city, node, g, node.visited | (1 << city.index)))
 
 	#If we found no successors, this means we have all cities in the path
 	#in this case, we add the starting node so our path can go back home
 	if not successors:
-		nPath = list(node.path)
-		nPath.append(node.path[0])
-		f = pathcost + mstcost + EuclideanCost(node.path[-1], node.path[0])
-		successors.append(CostTuple(f, nPath))
+		g = pathcost + Distance(node.city, node.start)
+		f = g + mstcost
+		successors.append(CostTuple(f, node.start, node, g, node.visited))
 
 	return sorted(successors)
 
 #Perform A* Search
-def Search(cities):
+#With neighbour lists, successors are limited to nearby cities (see FindSuccessors)
+#If metrics (a SolverMetrics) are given, they are sent a sample every metrics.interval expansions.
+#With a PathBound, the heuristic uses it as well as the MST (see FindSuccessors).
+def Search(cities, neighbours=None, metrics=None, bound=None):
 	totalCities = len(cities)
 	nodesGenerated = 0
+	nodesExpanded = 0
 
 	#If there is only one city, we generate 0 nodes
 	if len(cities) == 1:
 		return (nodesGenerated, [cities[0]])
-	#We start with the first city, A, on our queue (priority queue on the cost)
+	#We start with the first city, A, on our queue (a heap on the cost)
 	#A is first because cities are sorted by letter when they are made
-	fringe = queue.PriorityQueue()
-	startingNode = CostTuple(0, [cities[0]])
-	fringe.put(startingNode)
+	fringe = []
+	startingNode = CostTuple(0, cities[0], None, 0, 1 << cities[0].index)
+	heapq.heappush(fringe, startingNode)
+
+	#The cheapest path cost found so far for each (visited cities, current city) state
+	bestCosts = {startingNode.State(): 0}
 
 	while fringe:
-		node = fringe.get()
+		node = heapq.heappop(fringe)
+
+		#Skip nodes that a cheaper path to the same state has replaced since they were put on the heap
+		if node.g > bestCosts[node.State()]:
+			continue
+
 		#Get the first city off the queue, and check if it satisfies the goal state:
 		#There are all the cities in the path, plus an extra copy of the first city
 		#For the cycle to be complete, the first and last nodes must be the same.
-		if (len(node.path) == (totalCities+1)) and (node.path[0] == node.path[-1]):
+		if (node.depth == (totalCities+1)) and node.IsCycle():
+			if metrics is not None:
+				metrics.Improved(nodesGenerated, node.g)
+				metrics.Finish(expanded=nodesExpanded, generated=nodesGenerated, fringe=len(fringe), cost=node.g)
 			return (nodesGenerated, node.path)
 
 		#Get the successors of this city, add their count to our node count
 		#then, add them all to the fringe
-		successors = FindSuccessors(node, cities)
+		successors = FindSuccessors(node, cities, neighbours, bound)
 		nodesGenerated = nodesGenerated + len(successors)
+		nodesExpanded = nodesExpanded + 1
+		if metrics is not None and nodesExpanded % metrics.interval == 0:
+			metrics.Search(nodesExpanded, nodesGenerated, len(fringe), node.city.matrix)
 
-		#Is there a way to optimize this?
+		#Drop successors that are dominated by a path we already have to the same state
 		for successor in successors:
-			fringe.put(successor)
-
+			state = successor.State()
+			if state in bestCosts and bestCosts[state] <= successor.g:
+				continue
+			bestCosts[state] = successor.g
+			heapq.heappush(fringe, successor)
+
+	if metrics is not None:
+		metrics.Finish(expanded=nodesExpanded, generated=nodesGenerated, fringe=0, cost=None)
 	return (nodesGenerated, node.path)
 
+#Anytime A*
+########################################################
+#Weights tried by AnytimeSearch, in order. Each pass is a weighted A* search, so the first
+#passes find tours quickly and later passes improve them; the last pass (weight 1) is plain A*.
+ANYTIME_WEIGHTS = (3.0, 2.0, 1.5, 1.2, 1.0)
+
+#Default time budget for AnytimeSearch, in seconds
+ANYTIME_TIME_LIMIT = 10.0
+
+#How many nodes are expanded between checks of the clock
+ANYTIME_CHECK_INTERVAL = 256
+
+#AnytimeSearch: Weighted A* with a decreasing weight and a time and/or node budget.
+#Nodes are ordered by g + weight*h, where h is the MST heuristic used by Search; a pass with
+#weight w finds a tour that costs at most w times the optimal one. Every pass prunes nodes
+#whose unweighted f is no better than the best tour so far, starting from a nearest neighbour tour.
+#When the budget runs out, the best tour found so far is returned along with a proven lower
+#bound on the optimal cost: the larger of the MST of all cities, best/w for the last finished
+#pass, and the smallest unweighted f left on the fringe (or the best tour, if that is smaller).
+#Returns (nodes generated, path, lower bound). With no budget this finishes with the optimal tour.
+#metrics, if given, are sent a sample every metrics.interval expansions and each better tour.
+def AnytimeSearch(cities, timeLimit=ANYTIME_TIME_LIMIT, nodeLimit=None, weights=ANYTIME_WEIGHTS, metrics=None):
+	totalCities = len(cities)
+	nodesGenerated = 0
+	nodesExpanded = 0
+
+	if totalCities == 1:
+		return (nodesGenerated, [cities[0]], 0)
+
+	deadline = time.perf_counter() + timeLimit if timeLimit is not None else None
+	matrix = cities[0].matrix
+
+	bestPath = NearestNeighbourTour(cities).path
+	bestCost = CalculatePathCost(bestPath)
+	lowerBound = matrix.MSTCost(matrix.full)
+	if metrics is not None:
+		metrics.Improved(nodesGenerated, bestCost)
+
+	for weight in weights:
+		if lowerBound >= bestCost:
+			break
+
+		#The fringe holds (weighted f, node) pairs; node.cost is the unweighted f
+		fringe = []
+		startingNode = CostTuple(0, cities[0], None, 0, 1 << cities[0].index)
+		heapq.heappush(fringe, (0, startingNode))
+		bestCosts = {startingNode.State(): 0}
+		expanded = 0
+		finished = False
+
+		while fringe:
+			if nodeLimit is not None and nodesGenerated >= nodeLimit:
+				break
+			expanded = expanded + 1
+			if deadline is not None and expanded % ANYTIME_CHECK_INTERVAL == 0 and time.perf_counter() >= deadline:
+				break
+
+			key, node = heapq.heappop(fringe)
+			if node.g > bestCosts[node.State()] or node.cost >= bestCost:
+				continue
+
+			if (node.depth == (totalCities+1)) and node.IsCycle():
+				bestPath = node.path
+				bestCost = node.g
+				finished = True
+				if metrics is not None:
+					metrics.Improved(nodesGenerated, bestCost)
+				break
+
+			successors = FindSuccessors(node, cities)
+			nodesGenerated = nodesGenerated + len(successors)
+			nodesExpanded = nodesExpanded + 1
+			if metrics is not None and nodesExpanded % metrics.interval == 0:
+				metrics.Search(nodesExpanded, nodesGenerated, len(fringe), matrix)
+
+			for successor in successors:
+				if successor.cost >= bestCost:
+					continue
+				state = successor.State()
+				if state in bestCosts and bestCosts[state] <= successor.g:
+					continue
+				bestCosts[state] = successor.g
+				heuristic = successor.cost - successor.g
+				heapq.heappush(fringe, (successor.g + weight * heuristic, successor))
+		else:
+			#Everything left was pruned, so nothing beats the best tour we have
+			finished = True
+
+		if finished:
+			lowerBound = max(lowerBound, bestCost if not fringe else bestCost / weight)
+			continue
+
+		#Out of budget: anything better than the best tour still has a prefix on the fringe
+		openBound = min([node.cost for key, node in fringe] + [bestCost])
+		lowerBound = max(lowerBound, openBound)
+		break
+
+	lowerBound = min(lowerBound, bestCost)
+	if metrics is not None:
+		metrics.Finish(expanded=nodesExpanded, generated=nodesGenerated, cost=bestCost, bound=lowerBound)
+	return (nodesGenerated, bestPath, lowerBound)
+
+#Branch and Bound
+########################################################
+#BranchAndBoundSearch: Depth-first branch and bound. Successors come from FindSuccessors, cheapest
+#f first, and are only followed while their f is below the cost of the best tour found so far,
+#which starts as a nearest neighbour tour. Since successors are sorted, the first one that is
+#not below it ends the search of its siblings too.
+#Only the successors of the cities on the current path are kept, so memory is linear in the
+#number of cities (apart from the bounded MST cache), at the cost of expanding some states more
+#than once. Exact. With a PathBound, the heuristic uses it as well as the MST.
+def BranchAndBoundSearch(cities, metrics=None, bound=None):
+	totalCities = len(cities)
+	nodesGenerated = 0
+	nodesExpanded = 0
+
+	if totalCities == 1:
+		return (nodesGenerated, [cities[0]])
+
+	bestPath = NearestNeighbourTour(cities).path
+	bestCost = CalculatePathCost(bestPath)
+	if metrics is not None:
+		metrics.Improved(nodesGenerated, bestCost)
+
+	#One list of successors for each city on the current path, and how far through it we are
+	startingNode = CostTuple(0, cities[0], None, 0, 1 << cities[0].index)
+	stack = [([startingNode], 0)]
+
+	while stack:
+		successors, position = stack.pop()
+		if position >= len(successors) or successors[position].cost >= bestCost:
+			continue
+		node = successors[position]
+		stack.append((successors, position + 1))
+
+		if (node.depth == (totalCities+1)) and node.IsCycle():
+			bestPath = node.path
+			bestCost = node.g
+			if metrics is not None:
+				metrics.Improved(nodesGenerated, bestCost)
+			continue
+
+		children = FindSuccessors(node, cities, None, bound)
+		nodesGenerated = nodesGenerated + len(children)
+		nodesExpanded = nodesExpanded + 1
+		if metrics is not None and nodesExpanded % metrics.interval == 0:
+			metrics.Search(nodesExpanded, nodesGenerated, len(stack), node.city.matrix)
+		stack.append((children, 0))
+
+	if metrics is not None:
+		metrics.Finish(expanded=nodesExpanded, generated=nodesGenerated, cost=bestCost)
+	return (nodesGenerated, bestPath)
+
+#Held-Karp
+########################################################
+#Most cities HeldKarpSearch will take: its tables hold 2^(n-1) * (n-1) states, about 90MB at 20 cities
+HELD_KARP_LIMIT = 20
+
+#HeldKarpSearch: Solve TSP exactly by dynamic programming over subsets of cities.
+#best[mask][j] is the cheapest path that leaves the first city, visits every city in mask
+#and ends at city j. The first city is left out of the masks, so there are 2^(n-1) of them.
+#Unlike A*, the work done depends only on the number of cities: O(2^n * n^2) time, O(2^n * n) memory.
+#The node count returned is the number of (mask, city) states that were filled in.
+#There is no fringe to watch, so metrics (if given) only get a final sample.
+def HeldKarpSearch(cities, metrics=None):
+	totalCities = len(cities)
+	nodesGenerated = 0
+
+	if totalCities > HELD_KARP_LIMIT:
+		raise ValueError("{} cities is more than the Held-Karp solver can take ({} at most)".format(totalCities, HELD_KARP_LIMIT))
+
+	if totalCities == 1:
+		return (nodesGenerated, [cities[0]])
+
+	#Cities other than the first, and their costs, indexed from 0
+	others = totalCities - 1
+	costs = [[Distance(source, dest) for dest in cities[1:]] for source in cities[1:]]
+	homeCosts = [Distance(cities[0], city) for city in cities[1:]]
+
+	#Flat tables of (mask, city) states: the best cost and the city we came from to get it
+	states = 1 << others
+	best = array.array('d', [math.inf]) * (states * others)
+	parent = array.array('b', [-1]) * (states * others)
+
+	for j in range(0, others):
+		best[(1 << j) * others + j] = homeCosts[j]
+		nodesGenerated = nodesGenerated + 1
+
+	for mask in range(1, states):
+		members = [j for j in range(0, others) if (mask >> j) & 1]
+		if len(members) < 2:
+			continue
+
+		for j in members:
+			previousMask = mask & ~(1 << j)
+			previousBase = previousMask * others
+			bestCost = math.inf
+			bestParent = -1
+			for k in members:
+				if k == j:
+					continue
+				cost = best[previousBase + k] + costs[k][j]
+				if cost < bestCost:
+					bestCost = cost
+					bestParent = k
+			best[mask * others + j] = bestCost
+			parent[mask * others + j] = bestParent
+			nodesGenerated = nodesGenerated + 1
+
+	#Close the tour by returning to the first city from the best last city
+	fullMask = states - 1
+	last = min(range(0, others), key=lambda j: best[fullMask * others + j] + homeCosts[j])
+
+	#Walk the parents back to recover the path
+	path = [cities[0]]
+	mask = fullMask
+	while last != -1:
+		path.append(cities[last + 1])
+		previous = parent[mask * others + last]
+		mask = mask & ~(1 << last)
+		last = previous
+	path.append(cities[0])
+	path.reverse()
+
+	if metrics is not None:
+		metrics.Finish(generated=nodesGenerated, cost=CalculatePathCost(path))
+	return (nodesGenerated, path)
+
+#Number of nearest neighbours each city gets as successors in NeighbourSearch
+NEIGHBOURS = 5
+
+#NeighbourSearch: A* Search where each city only moves on to its nearest neighbours.
+#Much faster on larger instances, but the tour found is not guaranteed to be optimal.
+def NeighbourSearch(cities, metrics=None):
+	if len(cities) <= NEIGHBOURS + 1:
+		return Search(cities, None, metrics)
+	return Search(cities, cities[0].matrix.Neighbours(NEIGHBOURS), metrics)
+
+#HeldKarpBoundSearch: A* Search with the Held-Karp path bound as well as the MST as its heuristic.
+#The penalties are optimized once for the whole instance, against a nearest neighbour tour,
+#and then used for every node. Still exact, and generates far fewer nodes.
+def HeldKarpBoundSearch(cities, metrics=None):
+	if len(cities) <= 2:
+		return Search(cities, None, metrics)
+
+	matrix = cities[0].matrix
+	penalties = HeldKarpBound(matrix, NearestNeighbourTour(cities).cost)[1]
+	return Search(cities, None, metrics, PathBound(matrix, penalties))
+
+#Solvers that can be chosen from the command line. astar, astarhk, bnb and heldkarp are exact,
+#astarnn is not, and anytime is exact only if it finishes within its time budget.
+SOLVERS = {"astar": Search, "astarhk": HeldKarpBoundSearch, "bnb": BranchAndBoundSearch, "heldkarp": HeldKarpSearch,
+	"astarnn": NeighbourSearch, "anytime": AnytimeSearch}
+
 ########################################################
 def PrintPath(path):
 	pathstring = ""
@@ -157,27 +415,70 @@ def PrintPath(path):
 
 	return "Path: {}".format(pathstring)
 
-def main():
-	if len(sys.argv) == 2:							
-		filename = sys.argv[1]
-		#Compile a list of cities based on input data
-		cities = ConstructCities(filename)
+#SolveInstance: Solve the instance in a file with one of the SOLVERS, returning
+#a dictionary of the nodes generated, the path (as city ids), its cost and the time taken.
+#The anytime solver takes a time budget in seconds, and also reports its lower bound.
+#metrics (a SolverMetrics) are passed on to the solver.
+def SolveInstance(filename, solver="astar", timeLimit=ANYTIME_TIME_LIMIT, metrics=None):
+	#Compile a list of cities based on input data
+	cities = LoadCities(filename)
+
+	#Every search needs a DistanceMatrix, which the loader only makes for small enough instances
+	if cities and cities[0].matrix is None:
+		raise ValueError("{}: {} cities is more than the search solvers can take ({} at most)".format(filename, len(cities), MATRIX_LIMIT))
+
+	#Start the timer and begin our search
+	starttime = datetime.datetime.now()
+	if solver == "anytime":
+		results = AnytimeSearch(cities, timeLimit, metrics=metrics)
+	else:
+		results = SOLVERS[solver](cities, metrics=metrics)
+	endtime = datetime.datetime.now()
+
+	solution = {
+		"nodes": results[0],
+		"path": [city.id for city in results[1]],
+		"cost": CalculatePathCost(results[1]),
+		"time": (endtime - starttime).total_seconds(),
+	}
+	if len(results) > 2:
+		solution["bound"] = results[2]
+	return solution
 
-		#Start the timer and begin our A* Search
-		starttime = datetime.datetime.now()
-		results = Search(cities)
-		endtime = datetime.datetime.now()
+def main():
+	#Take out the options for progress samples, traces and profiling (see SolverMetrics)
+	arguments, metrics, profileFile = ParseMetricsArguments(sys.argv)
+
+	if len(arguments) in (2, 3, 4) and (len(arguments) == 2 or arguments[2] in SOLVERS):
+		filename = arguments[1]
+		#Optionally choose the solver: astar (default), astarhk, bnb, heldkarp, astarnn or anytime,
+		#and for anytime, its time budget in seconds
+		solver = "astar"
+		if len(arguments) >= 3:
+			solver = arguments[2]
+		timeLimit = ANYTIME_TIME_LIMIT
+		if len(arguments) == 4:
+			timeLimit = float(arguments[3])
+
+		try:
+			if profileFile:
+				results = RunProfiled(SolveInstance, (filename, solver, timeLimit, metrics), profileFile)
+			else:
+				results = SolveInstance(filename, solver, timeLimit, metrics)
+		except ValueError as error:
+			print(error)
+			quit()
 
 		#Print out useful information about our search
-		pathcost = CalculatePathCost(results[1])
-		
-		print("Nodes: " + str(results[0]))
-		print(PrintPath(results[1]))
-		print("Cost: " + str(pathcost))
-		elapsedtime = (endtime - starttime).total_seconds()
-		print("Time: " + "{0:.4}".format(elapsedtime) + " seconds")
+		print("Nodes: " + str(results["nodes"]))
+		print("Path: " + ",".join(results["path"]))
+		print("Cost: " + str(results["cost"]))
+		if "bound" in results:
+			print("Lower bound: " + str(results["bound"]))
+		print("Time: " + "{0:.4}".format(results["time"]) + " seconds")
 	else:
-		print("Incorrect parameters. Usage: A2Q1 <filepath>")
+		print("Incorrect parameters. Usage: A2Q1 <filepath> [astar|astarhk|bnb|heldkarp|astarnn|anytime [seconds]] [--progress] [--trace=<file>] [--profile=<file>]")
 		quit()
 
-main()
+if __name__ == "__main__":
+	main()
@@ -3,20 +3,26 @@
 #20375706
 
 #Purpose: Using Simulated Annealing, solve TSP for a given instance
-import sys, string, math, datetime, itertools
+import sys, string, math, datetime, itertools, array, collections, concurrent.futures
 from TSPObjects import *
+from TSPLoader import LoadCities
+from SolverMetrics import ParseMetricsArguments, RunProfiled
+from LowerBound import TourBound
+from Construction import CONSTRUCTIONS
 from random import *
 
 #GenerateRandomTour: Generate an initial random solution
-#for this problem instance.
-def GenerateRandomTour(cities):
-	remainingCities = cities
+#for this problem instance. The list of cities given is left as it is.
+#Draws from generator (a Random) if given, otherwise from the shared random state.
+def GenerateRandomTour(cities, generator=None):
+	pick = generator.randint if generator else randint
+	remainingCities = list(cities)
 	start = remainingCities.pop(0)
 	tour = Tour()
 	tour.AddCity(start)
 
 	for i in range(0, len(remainingCities)):
-		nextCity = randint(0, len(remainingCities)-1)
+		nextCity = pick(0, len(remainingCities)-1)
 		tour.AddCity(remainingCities.pop(nextCity))
 
 	tour.AddCity(start)
@@ -24,8 +30,7 @@ def GenerateRandomTour(cities):
 
 #Accept: Accept a given move if it creates a better path with 100% probability, 
 #otherwise accept it with a probability according to Boltzmann distribution
-def Accept(currentTour, newTour, temperature):
-	delta = newTour.cost-currentTour.cost
+def Accept(delta, temperature):
 	if (delta <= 0):
 		return True
 	else:
@@ -34,78 +39,713 @@ def Accept(currentTour, newTour, temperature):
 	
 	return False
 
-#Generate the cooling schedule, using the Fitzpatrick method
+#Generate the cooling schedule, using the Fitzpatrick method.
+#Temperatures are generated one at a time as they are needed, instead of all up front.
 def CoolingSchedule(startingTemperature, coolingRate):
-	schedule = []
 	t = startingTemperature
 	while t > 1:
-		schedule.append(t)
+		yield t
 		t = t*coolingRate
-	return schedule
 
-#GenerateRandomSwapMoves: Generates all size k combinations of random indicies
-def GenerateRandomSwapMoves(tourLength, k):
-	#This is for k vericies such that we can find their neighbour (2-opt)
-	indicies = list(range(1, tourLength-1))
-	return [list(x) for x in itertools.combinations(indicies,k)]
+#ScheduleLength: The number of temperatures in a cooling schedule: the number of steps i with
+#startingTemperature * coolingRate^i > 1
+def ScheduleLength(startingTemperature, coolingRate):
+	if startingTemperature <= 1:
+		return 0
+	return math.ceil(math.log(1/startingTemperature) / math.log(coolingRate))
 
-#Execute Simulated Annealing on a set of cities, using the given starting temperature and cooling rate. 
-def SimulatedAnnealing(cities, initialTemperature, coolingRate, k):
-	numberCities = len(cities)
+#AdaptiveSchedule: A cooling schedule that changes with how the search is going.
+#The annealing loop reports on the moves it makes through Record(tried, accepted, improved),
+#and the schedule responds:
+#	While more than targetAcceptance of the moves in a window are accepted, the tour is only
+#	wandering, so it cools speedup times as fast.
+#	After reheatAfter moves with no new best tour, the temperature is raised by reheatFactor
+#	(up to the starting temperature), at most reheats times.
+#	After patience moves with no new best tour (counting from the last reheat), it stops early.
+#Any of these can be turned off by leaving its setting as None. Like CoolingSchedule,
+#it ends once the temperature falls to 1.
+class AdaptiveSchedule:
+	def __init__(self, startingTemperature, coolingRate, targetAcceptance=None, window=1000, speedup=10,
+			reheatAfter=None, reheatFactor=2.0, reheats=3, patience=None):
+		self.startingTemperature = startingTemperature
+		self.coolingRate = coolingRate
+		self.targetAcceptance = targetAcceptance
+		self.window = window
+		self.speedup = speedup
+		self.reheatAfter = reheatAfter
+		self.reheatFactor = reheatFactor
+		self.reheats = reheats
+		self.patience = patience
 
-	#Generate an initial tour, randomly
-	currentTour = GenerateRandomTour(cities)
-	bestTour = Tour(currentTour)
-	print("Initial: " + '\n' + str(currentTour))
+		self.temperature = startingTemperature
+		self.rate = coolingRate
+		self.steps = 0
+		self.sinceImprovement = 0
+		self.windowTried = 0
+		self.windowAccepted = 0
+		self.reheated = 0
+		self.stoppedEarly = False
 
-	if numberCities <= 2:
-		return bestTour
+	def __repr__(self):
+		return "AdaptiveSchedule: {} steps, temperature {}, {} reheats".format(self.steps, self.temperature, self.reheated)
 
-	#Create a cooling schedule
-	coolingSchedule = CoolingSchedule(initialTemperature, coolingRate)
-	temperature = initialTemperature
+	def __iter__(self):
+		while self.temperature > 1:
+			if self.patience is not None and self.sinceImprovement >= self.patience:
+				self.stoppedEarly = True
+				return
+			yield self.temperature
+			self.steps += 1
+			self.temperature = self.temperature * self.rate
+
+	#Record: Report that tried moves were made at the last temperatures, of which accepted were
+	#accepted, and whether any of them gave a new best tour
+	def Record(self, tried, accepted, improved):
+		if improved:
+			self.sinceImprovement = 0
+		else:
+			self.sinceImprovement += tried
+
+		if self.targetAcceptance is not None:
+			self.windowTried += tried
+			self.windowAccepted += accepted
+			if self.windowTried >= self.window:
+				hot = self.windowAccepted > self.targetAcceptance * self.windowTried
+				self.rate = self.coolingRate ** self.speedup if hot else self.coolingRate
+				self.windowTried = 0
+				self.windowAccepted = 0
+
+		if self.reheatAfter is not None and self.sinceImprovement >= self.reheatAfter and self.reheated < self.reheats:
+			self.temperature = min(self.startingTemperature, self.temperature * self.reheatFactor)
+			self.reheated += 1
+			self.sinceImprovement = 0
+
+#RandomMove: Sample a single move of the given kind on a tour of tourLength positions.
+#The first and last positions hold the start city, so only the ones between them are moved.
+def RandomMove(tourLength, k, moveType):
+	#Swap: k random indicies, of which the first two are exchanged
+	if moveType == SWAP:
+		indicies = sorted(sample(range(1, tourLength-1), k))
+		return (SWAP, indicies[0], indicies[1])
+
+	#2-opt: reverse the segment between two random indicies
+	if moveType == REVERSE:
+		indicies = sorted(sample(range(1, tourLength-1), 2))
+		return (REVERSE, indicies[0], indicies[1])
+
+	if moveType != OROPT:
+		raise ValueError("Unknown move type: {}".format(moveType))
+
+	#Or-opt: move a segment of up to 3 cities to sit after any position outside of it
+	length = randint(1, min(3, tourLength-3))
+	start = randint(1, tourLength-1-length)
+	after = randint(0, tourLength-length-3)
+	if after >= start-1:
+		after = after + length + 1
+	return (OROPT, start, length, after)
 
-	#Generate all possible index swaps
-	randomSwaps = GenerateRandomSwapMoves(len(currentTour.path), k)
+#GenerateRandomMoves: Generates random moves one at a time, forever.
+#Moves are sampled directly instead of enumerating every combination of indicies,
+#so memory stays constant no matter how many cities there are.
+def GenerateRandomMoves(tourLength, k, moveType):
+	while True:
+		yield RandomMove(tourLength, k, moveType)
 
+#Number of moves the batched kernel scores at once
+BATCH_SIZE = 64
+
+#Number of nearest neighbours each city may be joined to by NEIGHBOUR_REVERSE moves
+NEIGHBOURS = 8
+
+#RandomPositionPairs: count random pairs of distinct positions between 1 and tourLength-2,
+#as two lists (firsts, lasts) with first < last in each pair
+def RandomPositionPairs(tourLength, count):
+	firsts = [1 + int(random() * (tourLength-2)) for i in range(0, count)]
+	lasts = [1 + int(random() * (tourLength-3)) for i in range(0, count)]
+	for p in range(0, count):
+		if lasts[p] >= firsts[p]:
+			lasts[p] += 1
+		else:
+			firsts[p], lasts[p] = lasts[p], firsts[p]
+	return (firsts, lasts)
+
+#AnnealBatched: The annealing loop for swap and 2-opt moves over an ArrayTour.
+#Each batch scores a number of random moves against the current tour in one pass, then walks
+#through them with their temperatures until one is accepted. The moves after it were scored
+#against the old tour, so they are thrown away and their temperatures start the next batch.
+#While the tour is hot most moves are accepted, so the batch size follows how many moves it took
+#to accept the last one, doubling after a batch with no acceptance, up to maxBatchSize.
+#Changes currentTour in place, like Anneal, and returns the best tour seen.
+#NEIGHBOUR_REVERSE moves pick a random city and join it to one of its nearest neighbours.
+#An AdaptiveSchedule is told about each batch once it is done; since the temperatures for a
+#batch are taken before its moves are made, the schedule reacts up to a batch late.
+def AnnealBatched(currentTour, temperatures, moveType, metrics=None, maxBatchSize=BATCH_SIZE):
+	arrayTour = ArrayTour(currentTour)
+	bestCost = arrayTour.cost
+	bestOrder = array.array('i', arrayTour.order)
+	tourLength = len(arrayTour.order)
+
+	if moveType == NEIGHBOUR_REVERSE:
+		neighbours = arrayTour.Neighbours(min(NEIGHBOURS, arrayTour.size-1))
+		scoreMoves = arrayTour.ReverseDeltas
+		makeMove = arrayTour.Reverse
+	elif moveType == REVERSE:
+		scoreMoves = arrayTour.ReverseDeltas
+		makeMove = arrayTour.Reverse
+	else:
+		scoreMoves = arrayTour.SwapDeltas
+		makeMove = arrayTour.Swap
+
+	exp = math.exp
+	record = getattr(temperatures, "Record", None)
+	temperatures = iter(temperatures)
+	batch = []
+	batchSize = 1
 	iterations = 0
-	for temperature in coolingSchedule:
-		newTour = Tour(currentTour)
+	acceptedMoves = 0
+	while True:
+		batch.extend(itertools.islice(temperatures, max(0, batchSize - len(batch))))
+		if not batch:
+			break
+
+		if moveType == NEIGHBOUR_REVERSE:
+			positions = [1 + int(random() * (tourLength-2)) for step in batch]
+			firsts, lasts = arrayTour.NeighbourPairs(positions, [random() for step in batch], neighbours)
+		else:
+			firsts, lasts = RandomPositionPairs(tourLength, len(batch))
+		deltas = scoreMoves(firsts, lasts)
+
+		accepted = len(batch)
+		improved = False
+		for step in range(0, len(batch)):
+			delta = deltas[step]
+			if delta <= 0 or exp(-delta/batch[step]) > random():
+				makeMove(firsts[step], lasts[step], delta)
+				if arrayTour.cost < bestCost:
+					bestCost = arrayTour.cost
+					bestOrder = array.array('i', arrayTour.order)
+					improved = True
+					if metrics is not None:
+						metrics.Improved(iterations + step + 1, bestCost)
+				accepted = step
+				acceptedMoves += 1
+				break
+
+		#Every move up to and including the accepted one has been used
+		used = min(accepted + 1, len(batch))
+		if record:
+			record(used, 1 if accepted < len(batch) else 0, improved)
+		if accepted < len(batch):
+			batchSize = min(maxBatchSize, used)
+		else:
+			batchSize = min(maxBatchSize, 2 * batchSize)
+		if metrics is not None and (iterations + used) // metrics.interval > iterations // metrics.interval:
+			metrics.Anneal(iterations + used, acceptedMoves, arrayTour.cost, bestCost, batch[used-1])
+		iterations += used
+		batch = batch[used:]
+
+	currentTour.path = arrayTour.Path()
+	currentTour.cost = arrayTour.cost
+
+	bestTour = Tour()
+	bestTour.path = [arrayTour.cities[i] for i in bestOrder]
+	bestTour.cost = bestCost
+	if metrics is not None:
+		metrics.Finish(steps=iterations, accepted=acceptedMoves, cost=currentTour.cost, best=bestCost)
+	return bestTour
 
-		#Random 2-swap
-		move = randomSwaps[randint(0, len(randomSwaps)-1)]	
-		newTour.SwapCities(move)
+#Anneal: Run the annealing loop on a tour over the given temperatures, changing it in place.
+#Returns the best tour seen along the way.
+#metrics (a SolverMetrics), if given, get a sample every metrics.interval steps and each new best tour.
+def Anneal(currentTour, temperatures, k, moveType, metrics=None):
+	#Swap and 2-opt moves go through the batched kernel, with or without a DistanceMatrix
+	if moveType in (SWAP, REVERSE, NEIGHBOUR_REVERSE):
+		return AnnealBatched(currentTour, temperatures, moveType, metrics)
+	return AnnealTour(currentTour, temperatures, k, moveType, metrics)
 
-		#Should we accept this move?
-		if(Accept(currentTour, newTour, temperature)):
-			currentTour = Tour(newTour)
+#AnnealTour: The annealing loop over a Tour, one move at a time, for swap, 2-opt and Or-opt moves.
+#An AdaptiveSchedule is told about every move.
+def AnnealTour(currentTour, temperatures, k, moveType, metrics=None):
+	bestTour = Tour(currentTour)
+	record = getattr(temperatures, "Record", None)
+
+	#Sample moves lazily as we need them
+	randomMoves = GenerateRandomMoves(len(currentTour.path), k, moveType)
+
+	iterations = 0
+	acceptedMoves = 0
+	for temperature in temperatures:
+		#Random move, scored by the change in cost alone
+		move = next(randomMoves)
+		delta = currentTour.MoveDelta(move)
+
+		#Should we accept this move? Only then do we touch the tour
+		accepted = Accept(delta, temperature)
+		if(accepted):
+			currentTour.ApplyMove(move)
+			acceptedMoves += 1
 		
 		#Update best tour if needed
-		if (currentTour < bestTour):
+		improved = currentTour < bestTour
+		if (improved):
 			bestTour = Tour(currentTour)
 
+		if record:
+			record(1, 1 if accepted else 0, improved)
+
 		iterations += 1
-		if (iterations % 50000 == 0):
-			print(currentTour.cost)
+		if metrics is not None:
+			if improved:
+				metrics.Improved(iterations, bestTour.cost)
+			if iterations % metrics.interval == 0:
+				metrics.Anneal(iterations, acceptedMoves, currentTour.cost, bestTour.cost, temperature)
 
+	if metrics is not None:
+		metrics.Finish(steps=iterations, accepted=acceptedMoves, cost=currentTour.cost, best=bestTour.cost)
 	return bestTour
 
-def SetupAnnealing(cities):
-	initialTemperature = 15000
+#Settings of the AdaptiveSchedule used when annealing adaptively
+ADAPTIVE_SETTINGS = {"targetAcceptance": 0.5, "reheatAfter": 50000, "reheats": 2, "patience": 100000}
+
+#Ways to build the starting tour: a random tour, or any of the construction heuristics
+STARTING_TOURS = dict(CONSTRUCTIONS, random=GenerateRandomTour)
+
+#Starting temperature for a constructed tour, as a fraction of its average edge cost.
+#Much lower than for a random tour, so annealing refines the tour instead of scrambling it.
+SEED_TEMPERATURE_SCALE = 0.5
+
+#Execute Simulated Annealing on a set of cities, using the given starting temperature and cooling rate. 
+#With adaptive set, an AdaptiveSchedule with ADAPTIVE_SETTINGS is used instead of the Fitzpatrick schedule.
+#Progress is sent to metrics (a SolverMetrics), if given.
+#construction names how the starting tour is built (see STARTING_TOURS). If initialTemperature
+#is None, it is set from the starting tour's average edge cost by SEED_TEMPERATURE_SCALE.
+#Returns the best tour found and (a copy of) the starting tour.
+def SimulatedAnnealing(cities, initialTemperature, coolingRate, k, moveType=SWAP, adaptive=False, metrics=None, construction="random"):
+	numberCities = len(cities)
+
+	#Generate an initial tour, randomly or with a construction heuristic
+	currentTour = STARTING_TOURS[construction](cities)
+	initialTour = Tour(currentTour)
+
+	if numberCities <= 2:
+		return (Tour(currentTour), initialTour)
+
+	if initialTemperature is None:
+		initialTemperature = SEED_TEMPERATURE_SCALE * currentTour.cost / numberCities
+
+	#Create a cooling schedule
+	if adaptive:
+		coolingSchedule = AdaptiveSchedule(initialTemperature, coolingRate, **ADAPTIVE_SETTINGS)
+	else:
+		coolingSchedule = CoolingSchedule(initialTemperature, coolingRate)
+	return (Anneal(currentTour, coolingSchedule, k, moveType, metrics), initialTour)
+
+#SetupAnnealing: Anneal from a random tour, or from a constructed one at a lower starting temperature.
+#Returns the best tour found and the starting tour.
+def SetupAnnealing(cities, moveType=SWAP, adaptive=False, metrics=None, construction="random"):
+	initialTemperature = 15000 if construction == "random" else None
 	coolingRate = 0.999985
-	tour = SimulatedAnnealing(cities, initialTemperature, coolingRate, 2)
+	return SimulatedAnnealing(cities, initialTemperature, coolingRate, 2, moveType, adaptive, metrics, construction)
+
+#Local Improvement
+########################################################
+#Number of nearest neighbours each city is tried against by ImproveTour
+IMPROVE_NEIGHBOURS = 10
+
+#Gains smaller than this are treated as no gain, so rounding error can't make ImproveTour cycle
+IMPROVE_EPSILON = 1e-9
+
+#TwoOptMove: Look for a 2-opt move that removes one of the two tour edges at city a.
+#For each of the edges (a, b), only the neighbours c of a that are closer to a than b is are
+#tried, since otherwise the new edge (a, c) is already longer than the edge it replaces.
+#Makes the first improving move found and returns the cities whose edges changed, or None.
+def TwoOptMove(arrayTour, a, neighbours):
+	order = arrayTour.order
+	positions = arrayTour.positions
+	flat = arrayTour.flat
+	n = arrayTour.size
+
+	i = positions[a]
+	for direction in (1, -1):
+		b = order[(i + direction) % n]
+		ab = flat[a*n + b]
+		for c in neighbours[a]:
+			ac = flat[a*n + c]
+			if ac >= ab:
+				break
+			j = positions[c]
+			d = order[(j + direction) % n]
+			if d == a or c == b:
+				continue
+
+			gain = ab + flat[c*n + d] - ac - flat[b*n + d]
+			if gain > IMPROVE_EPSILON:
+				#Going forward: a, b ... c, d becomes a, c ... b, d
+				#Going back: d, c ... b, a becomes ... b, d ... c, a, read backwards
+				if direction == 1:
+					arrayTour.ReverseCycle((i + 1) % n, j, -gain)
+				else:
+					arrayTour.ReverseCycle(i, (j - 1) % n, -gain)
+				return [a, b, c, d]
+	return None
+
+#OrOptMove: Look for an Or-opt move of a segment of 1 to 3 cities that starts or ends at city a.
+#The segment is put back next to one of the nearest neighbours of either of its end cities,
+#either way around. Makes the first improving move found and returns the cities whose edges
+#changed, or None.
+def OrOptMove(arrayTour, a, neighbours):
+	order = arrayTour.order
+	positions = arrayTour.positions
+	flat = arrayTour.flat
+	n = arrayTour.size
+
+	i = positions[a]
+	for length in range(1, min(3, n-3) + 1):
+		for start in sorted({i, i - length + 1}):
+			end = start + length - 1
+			#The start city cannot be moved
+			if start < 1 or end > n - 1:
+				continue
+
+			s1 = order[start]
+			s2 = order[end]
+			before = order[start-1]
+			after = order[end+1]
+			removeGain = flat[before*n + s1] + flat[s2*n + after] - flat[before*n + after]
+			if removeGain <= IMPROVE_EPSILON:
+				continue
+
+			#x is the end of the segment joined to a neighbour c, y is the other end
+			for x, y in ((s1, s2), (s2, s1)):
+				for c in neighbours[x]:
+					xc = flat[x*n + c]
+					if xc >= removeGain:
+						break
+					t = positions[c]
+					if start <= t <= end:
+						continue
+
+					#Either c, x ... y, next(c) or prev(c), y ... x, c, as the edge the
+					#segment goes into and the cities it starts and ends with there
+					for edge, first, last in ((t, x, y), ((t - 1) % n, y, x)):
+						if start - 1 <= edge <= end:
+							continue
+						e1 = order[edge]
+						e2 = order[edge+1]
+						gain = removeGain - (flat[e1*n + first] + flat[last*n + e2] - flat[e1*n + e2])
+						if gain > IMPROVE_EPSILON:
+							arrayTour.MoveSegment(start, length, edge, first == s2, -gain)
+							return [before, after, s1, s2, e1, e2]
+	return None
+
+#ImproveTour: Deterministic local search. Makes improving 2-opt moves (and Or-opt moves, if orOpt
+#is set) until there are none left, trying each city only against its nearest neighbours.
+#Cities are kept on a queue with don't-look bits: a city comes off the queue once no move
+#around it helps, and only goes back on when one of its tour edges changes.
+#metrics (a SolverMetrics), if given, get a sample with the number of moves of each kind made.
+#Returns the improved tour; the tour given is not changed.
+def ImproveTour(currentTour, neighbourCount=IMPROVE_NEIGHBOURS, orOpt=True, metrics=None):
+	arrayTour = ArrayTour(currentTour)
+	n = arrayTour.size
+	if n < 5:
+		return Tour(currentTour)
+
+	neighbours = arrayTour.Neighbours(min(neighbourCount, n-1))
+	queue = collections.deque(arrayTour.order[0:n])
+	active = bytearray([1]) * n
+	twoOptMoves = 0
+	orOptMoves = 0
+
+	while queue:
+		a = queue.popleft()
+		active[a] = 0
+
+		changed = TwoOptMove(arrayTour, a, neighbours)
+		if changed is not None:
+			twoOptMoves += 1
+		elif orOpt:
+			changed = OrOptMove(arrayTour, a, neighbours)
+			if changed is not None:
+				orOptMoves += 1
+		if changed is None:
+			continue
+
+		for city in changed:
+			if not active[city]:
+				active[city] = 1
+				queue.append(city)
+
+	improvedTour = Tour()
+	improvedTour.path = arrayTour.Path()
+	improvedTour.cost = arrayTour.PathCost()
+	if metrics is not None:
+		metrics.Improve(twoOptMoves, orOptMoves, currentTour.cost, improvedTour.cost)
+	return improvedTour
+
+#SetupImprovement: Improve random (or constructed, see STARTING_TOURS) tours with ImproveTour, keeping the best.
+#metrics (a SolverMetrics), if given, get a sample from each start and the cost reached by each.
+#Returns the best tour and the cost reached from each start.
+def SetupImprovement(cities, starts=1, construction="random", metrics=None):
+	bestTour = None
+	costs = []
+	for start in range(0, starts):
+		tour = STARTING_TOURS[construction](cities)
+		if len(cities) > 2:
+			tour = ImproveTour(tour, metrics=metrics)
+		costs.append(tour.cost)
+		if bestTour is None or tour < bestTour:
+			bestTour = tour
+			if metrics is not None:
+				metrics.Improved(start + 1, tour.cost)
+	if metrics is not None:
+		metrics.Finish(starts=starts, costs=costs, best=bestTour.cost)
+	return (bestTour, costs)
+
+#Multi-start Annealing
+########################################################
+#Tours are sent between processes as the positions of their cities in the list of cities, since
+#every City refers to the whole DistanceMatrix. Each worker builds its own cities (and matrix)
+#once, from their ids and coordinates, when it starts.
+
+#The cities of a worker process, set up by StartChainWorker
+CHAIN_CITIES = None
+
+#StartChainWorker: Build the cities a worker's chains run on, with a DistanceMatrix if withMatrix is set
+def StartChainWorker(coordinates, withMatrix):
+	global CHAIN_CITIES
+	CHAIN_CITIES = [City(id, x, y) for id, x, y in coordinates]
+	if withMatrix:
+		DistanceMatrix(CHAIN_CITIES)
+
+#TourOrder: A tour as the positions of its cities, given the position of each city by id
+def TourOrder(tour, positions):
+	return array.array('i', [positions[city.id] for city in tour.path])
+
+#OrderTour: The Tour through the cities at the given positions, in order
+def OrderTour(cities, order):
+	tour = Tour()
+	for p in order:
+		tour.AddCity(cities[p])
 	return tour
 
+#AnnealChain: Run one chain of a multi-start search over part of the cooling schedule,
+#temperatures [first, first+count), with its own random seed. The round's first temperature is
+#computed directly rather than by stepping through the ones before it. Runs in a worker process
+#on a tour given as a TourOrder, so it returns the orders of the chain's current tour (to continue
+#from) and of its best tour.
+#With adaptive set, the chain runs a whole AdaptiveSchedule instead, and first and count are ignored.
+def AnnealChain(order, initialTemperature, coolingRate, first, count, k, moveType, chainSeed, adaptive=False):
+	seed(chainSeed)
+	if adaptive:
+		temperatures = AdaptiveSchedule(initialTemperature, coolingRate, **ADAPTIVE_SETTINGS)
+	else:
+		temperatures = itertools.islice(CoolingSchedule(initialTemperature * coolingRate**first, coolingRate), count)
+	tour = OrderTour(CHAIN_CITIES, order)
+	bestTour = Anneal(tour, temperatures, k, moveType)
+
+	positions = {city.id: p for p, city in enumerate(CHAIN_CITIES)}
+	return (TourOrder(tour, positions), TourOrder(bestTour, positions))
+
+#MultiStartAnnealing: Run independent annealing chains, each from its own random tour and seed,
+#on a pool of worker processes, and keep the best tour any of them finds. The starting tours
+#are drawn from their own Random, so the caller's random state is left alone.
+#With exchanges > 0 the schedule is split into exchanges+1 rounds. After each round every
+#chain carries on from the best tour found so far, so the chains share their progress.
+#adaptive and construction are as for SimulatedAnnealing: with a construction, every chain starts
+#from the same constructed tour and only their seeds differ. An AdaptiveSchedule can't be split
+#into rounds, so adaptive chains can't exchange tours.
+#metrics (a SolverMetrics), if given, get the best cost after each round and each chain's best cost
+#at the end; the chains themselves aren't sampled, as they run in other processes.
+#Returns the best tour and the cost of the best tour found by each chain.
+def MultiStartAnnealing(cities, initialTemperature, coolingRate, k, moveType=SWAP, chains=4, workers=None, exchanges=0, baseSeed=None,
+		adaptive=False, construction="random", metrics=None):
+	if adaptive and exchanges > 0:
+		raise ValueError("Adaptive annealing chains can't exchange tours")
+	if baseSeed is None:
+		baseSeed = randint(0, 2**31)
+
+	tours = []
+	for chain in range(0, chains):
+		if construction == "random":
+			tours.append(GenerateRandomTour(cities, Random(baseSeed + chain)))
+		else:
+			tours.append(STARTING_TOURS[construction](cities))
+	chainBest = [Tour(tour) for tour in tours]
+
+	if len(cities) <= 2:
+		if metrics is not None:
+			metrics.Finish(steps=0, costs=[tour.cost for tour in chainBest], best=tours[0].cost)
+		return (Tour(tours[0]), [tour.cost for tour in chainBest])
+
+	if initialTemperature is None:
+		initialTemperature = SEED_TEMPERATURE_SCALE * tours[0].cost / len(cities)
+
+	steps = ScheduleLength(initialTemperature, coolingRate)
+	rounds = exchanges + 1
+	positions = {city.id: p for p, city in enumerate(cities)}
+	coordinates = [(city.id, city.x, city.y) for city in cities]
+	withMatrix = cities[0].matrix is not None
+	bestCost = min(chainBest).cost
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=StartChainWorker, initargs=(coordinates, withMatrix)) as executor:
+		for r in range(0, rounds):
+			first = r * steps // rounds
+			count = (r+1) * steps // rounds - first
+
+			futures = []
+			for chain in range(0, chains):
+				chainSeed = baseSeed + chain + (r+1) * chains
+				futures.append(executor.submit(AnnealChain, TourOrder(tours[chain], positions), initialTemperature, coolingRate, first, count, k, moveType, chainSeed, adaptive))
+
+			for chain in range(0, chains):
+				order, bestOrder = futures[chain].result()
+				tours[chain] = OrderTour(cities, order)
+				roundBest = OrderTour(cities, bestOrder)
+				if roundBest < chainBest[chain]:
+					chainBest[chain] = roundBest
+
+			if metrics is not None and min(chainBest).cost < bestCost:
+				bestCost = min(chainBest).cost
+				metrics.Improved(first + count, bestCost)
+
+			#Exchange: every chain continues from the best tour so far
+			if r < rounds - 1:
+				best = min(chainBest)
+				tours = [Tour(best) for chain in range(0, chains)]
+
+	if metrics is not None:
+		metrics.Finish(steps=steps, costs=[tour.cost for tour in chainBest], best=min(chainBest).cost)
+	return (Tour(min(chainBest)), [tour.cost for tour in chainBest])
+
+#ChainSpread: Summarize the costs reached by the chains of a multi-start run
+def ChainSpread(costs):
+	mean = sum(costs) / len(costs)
+	return {
+		"best": min(costs),
+		"worst": max(costs),
+		"mean": mean,
+		"stdev": math.sqrt(sum((c - mean) ** 2 for c in costs) / len(costs)),
+	}
+
+#SetupMultiStartAnnealing: As SetupAnnealing, with chains annealing in parallel
+def SetupMultiStartAnnealing(cities, moveType=SWAP, chains=4, exchanges=0, adaptive=False, construction="random", metrics=None):
+	initialTemperature = 15000 if construction == "random" else None
+	coolingRate = 0.999985
+	return MultiStartAnnealing(cities, initialTemperature, coolingRate, 2, moveType, chains, None, exchanges, None, adaptive, construction, metrics)
+
+#Method that runs ImproveTour instead of annealing
+IMPROVE = "improve"
+
+#SolveInstance: Run annealing on the instance in a file, returning a dictionary
+#of the best path found (as city ids), its cost and the time taken.
+#With more than one chain, a multi-start run is made and the spread of chain costs is included.
+#With IMPROVE as the move type, ImproveTour is run from that many random tours instead.
+#With adaptive set, each chain anneals on an AdaptiveSchedule.
+#metrics (a SolverMetrics) follow a single annealing chain as it goes; for ImproveTour and
+#multi-start runs they get the moves made from each start, or the best cost after each round,
+#and finish with the cost reached by each start or chain.
+#With certify set, the Held-Karp lower bound on the instance and the tour's largest possible
+#gap to the optimal cost are included (see LowerBound.TourBound); both are None on instances
+#too big for a DistanceMatrix.
+#construction names how the chains' (or ImproveTour's) starting tours are built (see STARTING_TOURS).
+#A single annealing chain also reports its starting tour, as "initial" (with its cost and path).
+def SolveInstance(filename, moveType=SWAP, chains=1, exchanges=0, adaptive=False, metrics=None, certify=False, construction="random"):
+	#Compile a list of cities based on input data
+	cities = LoadCities(filename)
+	starttime = datetime.datetime.now()
+	spread = None
+	initial = None
+	if moveType == IMPROVE:
+		tour, costs = SetupImprovement(cities, chains, construction, metrics)
+		if chains > 1:
+			spread = ChainSpread(costs)
+	elif chains > 1:
+		tour, costs = SetupMultiStartAnnealing(cities, moveType, chains, exchanges, adaptive, construction, metrics)
+		spread = ChainSpread(costs)
+	else:
+		tour, initialTour = SetupAnnealing(cities, moveType, adaptive, metrics, construction)
+		initial = {"cost": initialTour.cost, "path": [city.id for city in initialTour.path]}
+	endtime = datetime.datetime.now()
+
+	results = {
+		"nodes": None,
+		"path": [city.id for city in tour.path],
+		"cost": tour.cost,
+		"time": (endtime - starttime).total_seconds(),
+		"spread": spread,
+		"initial": initial,
+	}
+	if certify and len(cities) > 2:
+		results["bound"], results["gap"] = TourBound(tour)
+	return results
+
+#Kinds of move that can be chosen from the command line, besides IMPROVE
+MOVE_TYPES = [SWAP, REVERSE, NEIGHBOUR_REVERSE, OROPT]
+
 def main():
-	if len(sys.argv) == 2:							
-		filename = sys.argv[1]
-		#Compile a list of cities based on input data
-		cities = ConstructCities(filename)
-		starttime = datetime.datetime.now()
-		tour = SetupAnnealing(cities)
-		endtime = datetime.datetime.now()
-		elapsedtime = (endtime - starttime).total_seconds()
-		print('\n' + "Final: " + '\n' + str(tour))
-		print("Time: " + "{0:.4f}".format(elapsedtime) + " seconds")
-
-main()
\ No newline at end of file
+	#Take out the options for progress samples, traces and profiling (see SolverMetrics)
+	arguments, metrics, profileFile = ParseMetricsArguments(sys.argv)
+
+	#Optionally check the tour found against the Held-Karp lower bound
+	certify = "--certify" in arguments
+	if certify:
+		arguments.remove("--certify")
+
+	#Optionally start from a constructed tour instead of a random one
+	construction = "random"
+	for argument in list(arguments):
+		if argument.startswith("--construction="):
+			construction = argument[len("--construction="):]
+			arguments.remove(argument)
+	if construction not in STARTING_TOURS:
+		print("Unknown construction: {}. Use one of {}".format(construction, ", ".join(sorted(STARTING_TOURS))))
+		quit()
+
+	#Optionally end the arguments with "adaptive" to anneal on an AdaptiveSchedule
+	adaptive = len(arguments) > 2 and arguments[-1] == "adaptive"
+	if adaptive:
+		arguments = arguments[:-1]
+
+	if len(arguments) in (2, 3, 4):
+		filename = arguments[1]
+		#Optionally choose the kind of move: swap (default), 2opt, 2optnn or oropt,
+		#or improve to run the local improvement engine instead of annealing
+		moveType = SWAP
+		if len(arguments) >= 3:
+			moveType = arguments[2]
+		if moveType not in MOVE_TYPES + [IMPROVE]:
+			print("Unknown move type: {}. Use one of {}".format(moveType, ", ".join(MOVE_TYPES + [IMPROVE])))
+			quit()
+
+		#Optionally run several chains in parallel (or improve several tours) and keep the best
+		chains = 1
+		if len(arguments) == 4:
+			chains = int(arguments[3])
+
+		#Options that don't work on this instance (see TSPLoader.MATRIX_LIMIT) are reported as errors
+		try:
+			if profileFile:
+				results = RunProfiled(SolveInstance, (filename, moveType, chains, 0, adaptive, metrics, certify, construction), profileFile)
+			else:
+				results = SolveInstance(filename, moveType, chains, 0, adaptive, metrics, certify, construction)
+		except ValueError as error:
+			print(error)
+			quit()
+		if results["initial"]:
+			initial = results["initial"]
+			print("Initial: " + '\n' + "Cost: {}, Path: {}".format(initial["cost"], ",".join(initial["path"])))
+		print('\n' + "Final: " + '\n' + "Cost: {}, Path: {}".format(results["cost"], ",".join(results["path"])))
+		if results["spread"]:
+			spread = results["spread"]
+			print("Chains: {}, Best: {}, Worst: {}, Mean: {}, Deviation: {}".format(chains, spread["best"], spread["worst"], spread["mean"], spread["stdev"]))
+		if "bound" in results:
+			if results["bound"] is None:
+				print("Lower bound: unavailable, the instance has too many cities for a distance matrix")
+			else:
+				print("Lower bound: {}, Gap: {:.4%}".format(results["bound"], results["gap"]))
+		print("Time: " + "{0:.4f}".format(results["time"]) + " seconds")
+	else:
+		print("Incorrect parameters. Usage: A2Q2 <filepath> [swap|2opt|2optnn|oropt|improve] [chains] [adaptive] [--certify] [--construction=<name>] [--progress] [--trace=<file>] [--profile=<file>]")
+		quit()
+
+if __name__ == "__main__":
+	main()
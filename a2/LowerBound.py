@@ -0,0 +1,126 @@
+#CS486 Assignment #2: Held-Karp lower bounds for TSP
+
+#Purpose: Lower bounds on tour costs that are much tighter than the MST.
+#A 1-tree is a spanning tree over every city but one, plus the two cheapest edges from that one.
+#Every tour is a 1-tree, so the cheapest 1-tree costs no more than the best tour. Adding a penalty
+#pi[i] to every edge at city i adds 2*pi[i] to the cost of every tour, but changes which 1-tree is
+#cheapest; subtracting 2*sum(pi) again keeps the bound valid for any penalties. Subgradient
+#optimization raises the penalties of cities with too many tree edges and lowers those with too
+#few, pushing the 1-tree towards a tour. The best bound found is the Held-Karp bound.
+
+#The same penalties give a bound on the rest of a partial tour for A*: a path from the current
+#city through the unvisited cities back to the start is a spanning tree whose ends have degree 1.
+
+import math, collections
+from TSPObjects import *
+
+#Subgradient steps taken by HeldKarpBound, and how many steps without a better bound
+#before the step size is halved
+HK_ITERATIONS = 300
+HK_PATIENCE = 20
+
+#PenalizedTree: The minimum spanning tree over the given city indices with penalized costs
+#costs[i][j] + penalties[i] + penalties[j] (see DistanceMatrix.PrimTree).
+#Returns the penalized cost of the tree and the degree of each city in it (by index).
+def PenalizedTree(matrix, indices, penalties):
+	treeCost, parents = matrix.PrimTree(indices, penalties)
+	degrees = [0] * matrix.size
+	for i in indices:
+		if parents[i] is not None:
+			degrees[i] += 1
+			degrees[parents[i]] += 1
+	return (treeCost, degrees)
+
+#OneTree: The cheapest 1-tree with penalized costs, with city 0 as the one outside the tree.
+#Returns its penalized cost and the degree of each city.
+def OneTree(matrix, penalties):
+	treeCost, degrees = PenalizedTree(matrix, list(range(1, matrix.size)), penalties)
+
+	row = matrix.costs[0]
+	edges = sorted((row[i] + penalties[0] + penalties[i], i) for i in range(1, matrix.size))
+	for cost, i in edges[:2]:
+		treeCost = treeCost + cost
+		degrees[i] += 1
+	degrees[0] = 2
+	return (treeCost, degrees)
+
+#HeldKarpBound: Optimize the 1-tree penalties by subgradient steps, using the cost of a known
+#tour (upperBound) to size the steps. Returns the best lower bound found and its penalties.
+#If a 1-tree turns out to be a tour, it is optimal and the bound is exact.
+def HeldKarpBound(matrix, upperBound, iterations=HK_ITERATIONS):
+	n = matrix.size
+	penalties = [0.0] * n
+	if n < 3:
+		return (upperBound, penalties)
+
+	bestBound = -math.inf
+	bestPenalties = list(penalties)
+	scale = 2.0
+	stalled = 0
+
+	for iteration in range(0, iterations):
+		treeCost, degrees = OneTree(matrix, penalties)
+		bound = treeCost - 2 * math.fsum(penalties)
+
+		if bound > bestBound + 1e-9:
+			bestBound = bound
+			bestPenalties = list(penalties)
+			stalled = 0
+		else:
+			stalled += 1
+			if stalled >= HK_PATIENCE:
+				scale = scale / 2
+				stalled = 0
+
+		norm = sum((d - 2) ** 2 for d in degrees)
+		if norm == 0 or scale < 1e-6 or bestBound >= upperBound - 1e-9:
+			break
+
+		step = scale * (upperBound - bound) / norm
+		penalties = [penalties[i] + step * (degrees[i] - 2) for i in range(0, n)]
+
+	return (min(bestBound, upperBound), bestPenalties)
+
+#PathBound: Lower bounds on the cost of finishing a partial tour, for A*.
+#The rest of a tour is a path from the current city through the unvisited cities to the start,
+#which is a spanning tree over them where the two ends have degree 1 and the rest degree 2.
+#So with fixed penalties, its cost is at least the penalized MST over those cities, less
+#2*pi for every city in it, plus pi back for each end. The tree part only depends on the set of
+#cities, so it is cached by bitmask in an LRU cache, as DistanceMatrix does for MSTCost.
+class PathBound:
+	def __init__(self, matrix, penalties):
+		self.matrix = matrix
+		self.penalties = penalties
+		self.cache = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def __repr__(self):
+		return "PathBound: {} cities, {} cached trees".format(self.matrix.size, len(self.cache))
+
+	#TreeBound: The penalized MST cost over the cities in a bitmask, less twice their penalties
+	def TreeBound(self, mask):
+		if mask in self.cache:
+			self.hits += 1
+			self.cache.move_to_end(mask)
+			return self.cache[mask]
+
+		self.misses += 1
+		indices = [i for i in range(self.matrix.size) if (mask >> i) & 1]
+		treeCost, degrees = PenalizedTree(self.matrix, indices, self.penalties)
+		bound = treeCost - 2 * math.fsum(self.penalties[i] for i in indices)
+		self.cache[mask] = bound
+		if len(self.cache) > MST_CACHE_SIZE:
+			self.cache.popitem(last=False)
+		return bound
+
+#TourBound: A certificate for a tour, e.g. one found by annealing: the Held-Karp lower bound
+#on its cities and how far the tour's cost could be above the optimal one, as a fraction.
+#Both are None if the cities have no DistanceMatrix to compute the bound over.
+def TourBound(tour):
+	matrix = tour.path[0].matrix
+	if matrix is None:
+		return (None, None)
+	bound, penalties = HeldKarpBound(matrix, tour.cost)
+	gap = (tour.cost - bound) / bound if bound > 0 else 0.0
+	return (bound, gap)
@@ -0,0 +1,87 @@
+#CS486 Assignment #2: Solve many TSP instances in parallel
+
+#Purpose: Spread instance files over a pool of worker processes, one instance per task,
+#so a sweep over the randTSP corpus uses every core instead of running serially.
+#Each task can be given a timeout; tasks that run over it are reported as timed out.
+
+#Usage: python ParallelSolve.py [--solver astar|bnb|heldkarp|anytime|anneal] [--workers N] [--timeout S] <filepath>...
+
+import sys, signal, argparse, concurrent.futures
+import InformedSearch, LocalSearch
+
+#SolverTimeout: Raised inside a worker when its task runs past the timeout
+class SolverTimeout(Exception):
+	pass
+
+def RaiseTimeout(signum, frame):
+	raise SolverTimeout()
+
+#TimedCall: Run function(*arguments) in a worker process, giving up after timeout seconds.
+#The timeout is enforced with a SIGALRM timer, so the worker is freed for the next task.
+#On platforms without SIGALRM (Windows) tasks always run to completion.
+#Returns a (status, result) pair as SolveInParallel does, so a failing task is reported as
+#an error whether or not it ran on a process pool.
+def TimedCall(function, arguments, timeout):
+	useAlarm = timeout and hasattr(signal, "setitimer")
+	if useAlarm:
+		signal.signal(signal.SIGALRM, RaiseTimeout)
+		signal.setitimer(signal.ITIMER_REAL, timeout)
+
+	try:
+		return ("ok", function(*arguments))
+	except SolverTimeout:
+		return ("timeout", None)
+	except Exception as error:
+		return ("error", repr(error))
+	finally:
+		if useAlarm:
+			signal.setitimer(signal.ITIMER_REAL, 0)
+
+#SolveInParallel: Call function(*arguments) for every entry of argumentsList on a process pool.
+#Returns a (status, result) pair per entry, in the same order, where status is one of
+#"ok", "timeout" or "error" (with the error message as the result).
+def SolveInParallel(function, argumentsList, workers=None, timeout=None):
+	results = [None] * len(argumentsList)
+
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+		futures = {}
+		for i in range(0, len(argumentsList)):
+			futures[executor.submit(TimedCall, function, argumentsList[i], timeout)] = i
+
+		for future in concurrent.futures.as_completed(futures):
+			try:
+				results[futures[future]] = future.result()
+			except Exception as error:
+				results[futures[future]] = ("error", repr(error))
+
+	return results
+
+#Solvers that can be chosen from the command line: the function and its extra arguments
+SOLVERS = {
+	"astar": (InformedSearch.SolveInstance, ("astar",)),
+	"bnb": (InformedSearch.SolveInstance, ("bnb",)),
+	"heldkarp": (InformedSearch.SolveInstance, ("heldkarp",)),
+	"anytime": (InformedSearch.SolveInstance, ("anytime",)),
+	"anneal": (LocalSearch.SolveInstance, ()),
+}
+
+def main():
+	parser = argparse.ArgumentParser(description="Solve TSP instance files in parallel")
+	parser.add_argument("files", nargs="+", help="instance files to solve")
+	parser.add_argument("--solver", default="astar", choices=sorted(SOLVERS))
+	parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+	parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per instance")
+	args = parser.parse_args()
+
+	function, extra = SOLVERS[args.solver]
+	results = SolveInParallel(function, [(f,) + extra for f in args.files], args.workers, args.timeout)
+
+	for filename, (status, result) in zip(args.files, results):
+		if status == "ok":
+			print("{}: Nodes: {}, Cost: {}, Time: {:.4f} seconds, Path: {}".format(
+				filename, result["nodes"], result["cost"], result["time"], ",".join(result["path"])))
+		else:
+			print("{}: {} {}".format(filename, status.upper(), result or ""))
+
+if __name__ == "__main__":
+	main()
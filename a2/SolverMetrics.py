@@ -0,0 +1,146 @@
+#CS486 Assignment #2: Progress and profiling hooks for the TSP solvers
+
+#Purpose: Let the solvers report how they are doing without printing anything themselves.
+#A solver given a SolverMetrics calls it every so often with its counters, and the metrics
+#object turns those into samples: nodes expanded per second, fringe size and MST cache hit rate
+#for A*, steps per second, acceptance ratio and temperature for annealing, and the moves made by
+#the local improvement engine. Each time the best tour improves, its cost is added to the best-cost
+#trajectory.
+#Samples are kept in a list, handed to an optional callback (PrintSample prints them), and
+#written to an optional trace file as one JSON object per line. The trace file is only created
+#once there is a sample to write.
+#RunProfiled runs a solver under cProfile and saves the stats for pstats or snakeviz.
+
+import sys, time, json, cProfile
+
+#SolverMetrics: Collects samples from a solver. interval is how many nodes (for search)
+#or steps (for annealing) go by between samples.
+class SolverMetrics:
+	def __init__(self, interval=50000, callback=None, traceFile=None):
+		self.interval = interval
+		self.callback = callback
+		self.traceFile = traceFile
+		self.trace = None
+		self.starttime = time.perf_counter()
+		self.samples = []
+
+		#(step or node count, cost) each time a better tour was found
+		self.trajectory = []
+
+		#Counters at the last annealing sample, for the acceptance ratio since then
+		self.lastSteps = 0
+		self.lastAccepted = 0
+
+	def __repr__(self):
+		return "SolverMetrics: {} samples, {} improvements".format(len(self.samples), len(self.trajectory))
+
+	#Search: A sample from a tree search, with the MST cache counters taken from the matrix
+	def Search(self, expanded, generated, fringeSize, matrix=None):
+		elapsed = time.perf_counter() - self.starttime
+		values = {
+			"expanded": expanded,
+			"generated": generated,
+			"nodesPerSecond": expanded / elapsed if elapsed > 0 else None,
+			"fringe": fringeSize,
+		}
+		if matrix is not None:
+			lookups = matrix.mstHits + matrix.mstMisses
+			values["mstHitRate"] = matrix.mstHits / lookups if lookups else None
+		self.Sample("search", values)
+
+	#Anneal: A sample from an annealing loop, steps and accepted being running totals
+	def Anneal(self, steps, accepted, cost, bestCost, temperature=None):
+		elapsed = time.perf_counter() - self.starttime
+		tried = steps - self.lastSteps
+		values = {
+			"steps": steps,
+			"stepsPerSecond": steps / elapsed if elapsed > 0 else None,
+			"acceptance": (accepted - self.lastAccepted) / tried if tried else None,
+			"cost": cost,
+			"best": bestCost,
+			"temperature": temperature,
+		}
+		self.lastSteps = steps
+		self.lastAccepted = accepted
+		self.Sample("anneal", values)
+
+	#Improve: A sample from the local improvement engine once a tour can't be improved any more,
+	#with how many moves of each kind it took to get there from startCost
+	def Improve(self, twoOptMoves, orOptMoves, startCost, cost):
+		values = {
+			"twoOptMoves": twoOptMoves,
+			"orOptMoves": orOptMoves,
+			"start": startCost,
+			"cost": cost,
+		}
+		self.Sample("improve", values)
+
+	#Improved: A better tour costing cost was found after count steps or nodes
+	def Improved(self, count, cost):
+		self.trajectory.append((count, cost))
+
+	#Finish: The last sample, with whatever the solver has to say about how it ended
+	def Finish(self, **values):
+		values["trajectory"] = self.trajectory
+		self.Sample("finish", values)
+		if self.trace:
+			self.trace.close()
+			self.trace = None
+			self.traceFile = None
+
+	#Sample: Record a sample, pass it on to the callback and write it to the trace
+	def Sample(self, kind, values):
+		sample = {"kind": kind, "time": time.perf_counter() - self.starttime}
+		sample.update(values)
+		self.samples.append(sample)
+		if self.callback:
+			self.callback(sample)
+		if self.traceFile:
+			if self.trace is None:
+				self.trace = open(self.traceFile, "w")
+			self.trace.write(json.dumps(sample) + "\n")
+
+#PrintSample: A callback that prints each sample on one line, to stderr so it stays apart from results
+def PrintSample(sample):
+	fields = []
+	for key, value in sample.items():
+		if key == "trajectory":
+			continue
+		if isinstance(value, float):
+			value = "{:.6g}".format(value)
+		fields.append("{}={}".format(key, value))
+	print(" ".join(fields), file=sys.stderr)
+
+#RunProfiled: Call function(*arguments) under cProfile, saving the stats to profileFile
+def RunProfiled(function, arguments, profileFile):
+	profiler = cProfile.Profile()
+	try:
+		return profiler.runcall(function, *arguments)
+	finally:
+		profiler.dump_stats(profileFile)
+
+#ParseMetricsArguments: Take the instrumentation options out of a command line.
+#	--progress			print samples as they are taken
+#	--trace=<file>		write samples to a file, one JSON object per line
+#	--profile=<file>	run under cProfile and save the stats
+#Returns the remaining arguments, a SolverMetrics (or None if neither --progress nor --trace
+#was given) and the profile file (or None).
+def ParseMetricsArguments(arguments):
+	remaining = []
+	progress = False
+	traceFile = None
+	profileFile = None
+	for argument in arguments:
+		if argument == "--progress":
+			progress = True
+		elif argument.startswith("--trace="):
+			traceFile = argument[len("--trace="):]
+		elif argument.startswith("--profile="):
+			profileFile = argument[len("--profile="):]
+		else:
+			remaining.append(argument)
+
+	metrics = None
+	if progress or traceFile:
+		metrics = SolverMetrics(callback=PrintSample if progress else None, traceFile=traceFile)
+	return (remaining, metrics, profileFile)
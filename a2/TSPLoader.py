@@ -0,0 +1,124 @@
+#CS486 Assignment #2: Loading TSP instances
+
+#Purpose: Read instances in any of the formats we support and return a list of City objects.
+#	Our own text format (randTSP): a count, then "<id> <x> <y>" per line
+#	TSPLIB (.tsp): header lines of "KEY : VALUE", then a NODE_COORD_SECTION
+#	Binary (.tspb): a header, the coordinates as packed doubles, then the city ids.
+#	It is memory-mapped, so the coordinates are read without parsing anything.
+#TSPLIB files are converted to binary the first time they are loaded, and the binary copy
+#is used from then on for as long as it is newer than the file it came from.
+
+import os, mmap, struct, array
+from TSPObjects import *
+
+#Binary layout: magic, format version and number of cities, then 2*count doubles
+#(x0, y0, x1, y1, ...), then the ids as UTF-8, one per line
+BINARY_MAGIC = b"TSPB"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sII")
+BINARY_EXTENSION = ".tspb"
+
+#Instances with more cities than this don't get a DistanceMatrix, since it needs
+#size^2 floats. Their costs are computed as they are needed instead.
+#Without a matrix, LocalSearch can anneal (any move type) and improve tours, starting from a
+#random, nn, greedy or sfc tour. The InformedSearch solvers, the christofides construction and
+#--certify all need the matrix, and say so instead of running.
+MATRIX_LIMIT = 5000
+
+#TSPLIB edge weight types we can compute from coordinates
+TSPLIB_WEIGHT_TYPES = ["EUC_2D"]
+
+#ReadTSPLIB: Read the cities of a TSPLIB file, one line at a time.
+#Note: TSPLIB rounds EUC_2D costs to the nearest integer. We don't, so our tour costs
+#are a little different from the published optimal ones.
+def ReadTSPLIB(filename):
+	header = {}
+	cities = []
+	with open(filename, "r") as tspFile:
+		lines = iter(tspFile)
+		for line in lines:
+			line = line.strip()
+			if line.startswith("NODE_COORD_SECTION"):
+				break
+			if ":" in line:
+				key, value = line.split(":", 1)
+				header[key.strip().upper()] = value.strip()
+
+		weightType = header.get("EDGE_WEIGHT_TYPE", "EUC_2D")
+		if weightType not in TSPLIB_WEIGHT_TYPES:
+			raise ValueError("{}: unsupported EDGE_WEIGHT_TYPE {}".format(filename, weightType))
+
+		for line in lines:
+			data = line.split()
+			if not data or data[0] == "EOF":
+				break
+			cities.append(City(data[0], data[1], data[2]))
+
+	if "DIMENSION" in header and int(header["DIMENSION"]) != len(cities):
+		raise ValueError("{}: DIMENSION is {} but there are {} cities".format(filename, header["DIMENSION"], len(cities)))
+	return cities
+
+#WriteBinary: Save cities in the binary format
+def WriteBinary(cities, filename):
+	coordinates = array.array('d')
+	for city in cities:
+		coordinates.append(city.x)
+		coordinates.append(city.y)
+
+	with open(filename, "wb") as binaryFile:
+		binaryFile.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(cities)))
+		binaryFile.write(coordinates.tobytes())
+		binaryFile.write("\n".join(city.id for city in cities).encode("utf-8"))
+
+#ReadBinary: Read cities from the binary format, memory-mapping the file so the
+#coordinates are used straight from the page cache
+def ReadBinary(filename):
+	with open(filename, "rb") as binaryFile:
+		if os.fstat(binaryFile.fileno()).st_size < BINARY_HEADER.size:
+			raise ValueError("{}: not a binary instance file".format(filename))
+
+		with mmap.mmap(binaryFile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+			magic, version, count = BINARY_HEADER.unpack_from(mapped, 0)
+			if magic != BINARY_MAGIC or version != BINARY_VERSION:
+				raise ValueError("{}: not a binary instance file".format(filename))
+
+			idStart = BINARY_HEADER.size + 16 * count
+			ids = mapped[idStart:].decode("utf-8").split("\n") if count else []
+
+			view = memoryview(mapped)
+			coordinates = view[BINARY_HEADER.size:idStart].cast('d')
+			cities = [City(ids[i], coordinates[2*i], coordinates[2*i+1]) for i in range(0, count)]
+			coordinates.release()
+			view.release()
+
+	return cities
+
+#CachedPath: Where the binary copy of an instance file is kept
+def CachedPath(filename):
+	return filename + BINARY_EXTENSION
+
+#ReadCached: Read a TSPLIB file through its binary copy, making the copy if it is
+#missing or older than the file
+def ReadCached(filename):
+	cached = CachedPath(filename)
+	if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(filename):
+		return ReadBinary(cached)
+
+	cities = ReadTSPLIB(filename)
+	WriteBinary(cities, cached)
+	return cities
+
+#LoadCities: Read an instance in any format, choosing the reader by file extension,
+#and index the cities into a DistanceMatrix if there are not too many of them.
+#Our own text format is sorted by id, as ConstructCities does; other formats keep file order.
+def LoadCities(filename, cache=True):
+	if filename.endswith(BINARY_EXTENSION):
+		cities = ReadBinary(filename)
+	elif filename.endswith(".tsp"):
+		cities = ReadCached(filename) if cache else ReadTSPLIB(filename)
+	else:
+		cities = ConstructCities(filename)
+
+	if len(cities) <= MATRIX_LIMIT:
+		DistanceMatrix(cities)
+	return cities
@@ -1,4 +1,4 @@
-import sys, string, math
+import sys, string, math, collections, array, heapq
 from random import *
 from decimal import *
 
@@ -9,17 +9,38 @@ def EuclideanCost(source, dest):
 	result = math.sqrt((x*x)+(y*y))
 	return float(result)
 
-#ConstructCities: Read data from the specified file and return a list of City objects
+#Coordinate: Read a coordinate as an int when it is a whole number, as in our own
+#instance files, and as a float otherwise
+def Coordinate(value):
+	number = float(value)
+	if number.is_integer():
+		return int(number)
+	return number
+
+#Distance: Look up the cost between two cities in their shared DistanceMatrix.
+#Cities that were never indexed by a matrix fall back to computing the Euclidean cost.
+def Distance(source, dest):
+	if source.distances is not None:
+		return source.distances[dest.index]
+	return EuclideanCost(source, dest)
+
+#ConstructCities: Read data from the specified file and return a list of City objects, sorted by id.
+#The cities are not indexed; TSPLoader.LoadCities gives them a DistanceMatrix if there are few enough.
 def ConstructCities(filename):
 	cities = []
+	totalCities = None
 	with open(filename, "r") as cityFile:
 		for city in cityFile:
 			data = city.split()
 			if len(data) == 1:
-				totalCities = data[0]
+				totalCities = int(data[0])
 			if len(data) == 3:
 				cities.append(City(data[0], data[1], data[2]))	
 	cityFile.close()	
+
+	if totalCities is not None and totalCities != len(cities):
+		raise ValueError("{}: expected {} cities but found {}".format(filename, totalCities, len(cities)))
+
 	return sorted(cities)
 
 #ConstructRoads: Using a list of City, compute the edges and their costs
@@ -32,13 +53,37 @@ def ConstructRoads(cities):
 					roads.append(Road(cities[i], cities[j]))
 	return sorted(roads)
 
+#Kinds of move a Tour can make
+#SWAP: (SWAP, first, second) exchanges two cities
+#REVERSE: (REVERSE, first, last) reverses the segment between two positions (2-opt)
+#OROPT: (OROPT, start, length, after) moves a short segment to sit after another position
+#NEIGHBOUR_REVERSE: 2-opt moves that join a city to one of its nearest neighbours.
+#These are only made by the batched annealing kernel over an ArrayTour.
+SWAP = "swap"
+REVERSE = "2opt"
+OROPT = "oropt"
+NEIGHBOUR_REVERSE = "2optnn"
+
+#Number of minimum spanning tree costs a DistanceMatrix remembers
+MST_CACHE_SIZE = 200000
+
+#Number of incremental cost updates a Tour makes before re-summing its whole path
+RESUM_INTERVAL = 1000
+
 #Objects
 #City: Contains an id and coordinates, x and y
+#Slotted, since every node of a search refers to cities and there can be many of them
 class City:
+	__slots__ = ("id", "x", "y", "matrix", "index", "distances")
+
 	def __init__(self, id, x, y):
 		self.id = id
-		self.x = int(x)
-		self.y = int(y)
+		self.x = Coordinate(x)
+		self.y = Coordinate(y)
+		#Set by DistanceMatrix: the matrix, our position in it and our row of costs
+		self.matrix = None
+		self.index = None
+		self.distances = None
 
 	def __repr__(self):
 		return '\n' + "City {}: X: {}, Y: {}".format(self.id, self.x, self.y)
@@ -49,12 +94,199 @@ class City:
 	def __lt__(self, other):
 		return self.id < other.id
 
+#DistanceMatrix: Costs between every pair of cities, computed once per instance.
+#Each city is given an integer index into the matrix and a reference to its row of costs.
+class DistanceMatrix:
+	def __init__(self, cities):
+		self.cities = list(cities)
+		self.size = len(self.cities)
+		self.costs = [[EuclideanCost(source, dest) for dest in self.cities] for source in self.cities]
+
+		#The same costs in one flat list, built by Flat the first time an ArrayTour needs it
+		self.flat = None
+
+		#Bitmask with every city index set
+		self.full = (1 << self.size) - 1
+
+		#MST costs by bitmask of the cities in the tree, least recently used first
+		self.mstCache = collections.OrderedDict()
+		self.mstHits = 0
+		self.mstMisses = 0
+
+		#Nearest neighbour lists, by number of neighbours
+		self.neighbours = {}
+
+		for i in range(0, self.size):
+			self.cities[i].matrix = self
+			self.cities[i].index = i
+			self.cities[i].distances = self.costs[i]
+
+	def __repr__(self):
+		return "DistanceMatrix: {} cities".format(self.size)
+
+	#Cost: The cost between two cities, by index
+	def Cost(self, source, dest):
+		return self.costs[source][dest]
+
+	#Flat: The costs in one flat list, costs[source][dest] at flat[source*size + dest].
+	#Only the annealing and improvement kernels use it, so the search solvers never pay for it.
+	def Flat(self):
+		if self.flat is None:
+			self.flat = [cost for row in self.costs for cost in row]
+		return self.flat
+
+	#Neighbours: For each city index, the indices of its k nearest other cities, closest first.
+	#Built once per k (see NearestNeighbourLists).
+	def Neighbours(self, k):
+		if k not in self.neighbours:
+			self.neighbours[k] = NearestNeighbourLists(self.cities, k)
+		return self.neighbours[k]
+
+	#Mask: The bitmask of a list of cities
+	def Mask(self, cities):
+		mask = 0
+		for city in cities:
+			mask = mask | (1 << city.index)
+		return mask
+
+	#MSTCost: The cost of the minimum spanning tree over the cities in a bitmask.
+	#Many A* nodes share the same unvisited cities, so costs are kept in a bounded LRU cache.
+	def MSTCost(self, mask):
+		if mask in self.mstCache:
+			self.mstHits += 1
+			self.mstCache.move_to_end(mask)
+			return self.mstCache[mask]
+
+		self.mstMisses += 1
+		cost = self.PrimMST(mask)
+		self.mstCache[mask] = cost
+		if len(self.mstCache) > MST_CACHE_SIZE:
+			self.mstCache.popitem(last=False)
+		return cost
+
+	#PrimMST: The cost of the minimum spanning tree over the cities in a bitmask (see PrimTree)
+	def PrimMST(self, mask):
+		return self.PrimTree([i for i in range(self.size) if (mask >> i) & 1])[0]
+
+	#PrimTree: Prim's algorithm over the matrix, for the cities with the given indices. O(n^2):
+	#each step adds the closest city outside the tree, then relaxes the others against it.
+	#With penalties (a list by index), the cost of an edge (i, j) is costs[i][j] + penalties[i] + penalties[j].
+	#Returns the cost of the tree and the parent of each city in it (by index), the first city
+	#being the root; cities not in the tree, and the root, have no parent (None).
+	def PrimTree(self, indices, penalties=None):
+		parents = [None] * self.size
+		if len(indices) <= 1:
+			return (0, parents)
+
+		#Cheapest known connection from each city outside the tree into it, and the tree city it is to
+		first = indices[0]
+		row = self.costs[first]
+		remaining = indices[1:]
+		if penalties is None:
+			closest = [row[i] for i in remaining]
+		else:
+			closest = [row[i] + penalties[first] + penalties[i] for i in remaining]
+		links = [first] * len(remaining)
+		treeCost = 0
+
+		while remaining:
+			nearest = min(range(len(remaining)), key=closest.__getitem__)
+			treeCost = treeCost + closest[nearest]
+			added = remaining[nearest]
+			parents[added] = links[nearest]
+
+			#Move the last city into the gap left by the one we added
+			remaining[nearest] = remaining[-1]
+			closest[nearest] = closest[-1]
+			links[nearest] = links[-1]
+			remaining.pop()
+			closest.pop()
+			links.pop()
+
+			row = self.costs[added]
+			if penalties is None:
+				for k in range(len(remaining)):
+					cost = row[remaining[k]]
+					if cost < closest[k]:
+						closest[k] = cost
+						links[k] = added
+			else:
+				penalty = penalties[added]
+				for k in range(len(remaining)):
+					cost = row[remaining[k]] + penalty + penalties[remaining[k]]
+					if cost < closest[k]:
+						closest[k] = cost
+						links[k] = added
+
+		return (treeCost, parents)
+
+#NearestNeighbourLists: For each city in the list, the positions in the list of its k nearest
+#other cities, closest first. Built from a KDTree over the city coordinates, so it needs no
+#DistanceMatrix and works on instances too big for one.
+def NearestNeighbourLists(cities, k):
+	tree = KDTree(cities)
+	return [tree.Nearest(city, k) for city in cities]
+
+#KDTree: A 2-d tree over city coordinates, for finding the nearest cities to a city
+#without looking at every other city. Cities are known by their position in the list the
+#tree is built from. Nodes are tuples of (city, position, axis, left, right),
+#where axis 0 splits on x and axis 1 splits on y.
+class KDTree:
+	def __init__(self, cities):
+		self.size = len(cities)
+		self.root = self.Build([(city, p) for p, city in enumerate(cities)], 0)
+
+	def __repr__(self):
+		return "KDTree: {} cities".format(self.size)
+
+	#Build: Split the cities at the median along the axis, alternating axes at each level
+	def Build(self, cities, depth):
+		if not cities:
+			return None
+
+		axis = depth % 2
+		cities.sort(key=lambda entry: (entry[0].x, entry[0].y) if axis == 0 else (entry[0].y, entry[0].x))
+		median = len(cities) // 2
+		city, position = cities[median]
+		return (city, position, axis, self.Build(cities[:median], depth+1), self.Build(cities[median+1:], depth+1))
+
+	#Nearest: The positions of the k cities closest to the given one (not counting itself), closest first
+	def Nearest(self, city, k):
+		#Max-heap of the best k so far, as (-squared distance, -position, position)
+		best = []
+		self.Search(self.root, city, k, best)
+		return [entry[2] for entry in sorted(best, reverse=True)]
+
+	def Search(self, node, city, k, best):
+		if node is None:
+			return
+
+		other, position, axis, left, right = node
+		if other is not city:
+			x = other.x - city.x
+			y = other.y - city.y
+			entry = (-(x*x + y*y), -position, position)
+			if len(best) < k:
+				heapq.heappush(best, entry)
+			elif entry > best[0]:
+				heapq.heapreplace(best, entry)
+
+		#Search the side of the split the city is on first, and the other side only if
+		#a city there could be closer than the furthest one we have
+		split = (city.x - other.x) if axis == 0 else (city.y - other.y)
+		near, far = (left, right) if split < 0 else (right, left)
+		self.Search(near, city, k, best)
+		if len(best) < k or split * split <= -best[0][0]:
+			self.Search(far, city, k, best)
+
 #Road: Contains a source city, a destination city and the euclidean cost between them
 class Road:
+	__slots__ = ("source", "dest", "cost")
+
 	def __init__(self, source, dest):
 		self.source = source.id
 		self.dest = dest.id
-		self.cost = EuclideanCost(source, dest)
+		self.cost = Distance(source, dest)
 
 	def __repr__(self):
 		return '\n' + "Road {} <-> {}, Cost: {}".format(self.source, self.dest, self.cost)
@@ -66,18 +298,52 @@ class Road:
 		return self.cost < other.cost
 
 #CostTuple: Used for A* Search
-#Contains the current cost and the path to get there
+#Contains the current cost and the city the path to get there ends at, as well as the cost
+#of the path itself (g) and a bitmask of the city indices visited along it.
+#Rather than each node copying its whole path, it points at its parent node: nodes that
+#share a path prefix share it in memory, and the path is only built when asked for.
 class CostTuple:
-	def __init__(self, cost, path):
+	__slots__ = ("cost", "city", "parent", "g", "visited", "depth", "start")
+
+	def __init__(self, cost, city, parent=None, g=0, visited=0):
 		self.cost = cost
-		self.path = path
+		self.city = city
+		self.parent = parent
+		self.g = g
+		self.visited = visited
+		if parent is None:
+			self.depth = 1
+			self.start = city
+		else:
+			self.depth = parent.depth + 1
+			self.start = parent.start
+
+	#path: The cities from the start to this node, found by walking the parents back
+	@property
+	def path(self):
+		path = []
+		node = self
+		while node is not None:
+			path.append(node.city)
+			node = node.parent
+		path.reverse()
+		return path
+
+	#IsCycle: Whether this node has returned to the start, completing the tour
+	def IsCycle(self):
+		return self.depth > 1 and self.city is self.start
+
+	#State: Two partial tours with the same visited cities that end at the same city
+	#have the same future, so only the cheaper of them is worth expanding
+	def State(self):
+		return (self.visited, self.city.index)
 
 	def __repr__(self):
 		return '\n' + "Node: Cost: {}, Path: {}".format(self.cost, self.path)
 
 	def __lt__(self, other):
 		if self.cost == other.cost:
-			return len(self.path) > len(other.path)
+			return self.depth > other.depth
 		else:
 			return self.cost < other.cost 
 
@@ -88,9 +354,11 @@ class Tour:
 		if other:
 			self.path = list(other.path)
 			self.cost = other.cost
+			self.updates = other.updates
 		else:
 			self.path = []
 			self.cost = float(0)
+			self.updates = 0
 
 	def __repr__(self):
 		pathstring = ""
@@ -114,22 +382,267 @@ class Tour:
 	#Add a city to our path
 	def AddCity(self, city):
 		self.path.append(city)
-		self.cost = self.cost + EuclideanCost(self.path[len(self.path)-1], self.path[len(self.path)-2])
+		self.cost = self.cost + Distance(self.path[len(self.path)-1], self.path[len(self.path)-2])
 
 	#Swap two cities along the path
 	def SwapCities(self, combo):
+		delta = self.SwapDelta(combo)
 		first = combo[0]
 		second = combo[1]
 		self.path[first], self.path[second] = self.path[second], self.path[first]
-		self.UpdateCost(first, second)
-
-	#Update the cost of our path
-	#Note: We don't need to loop over here every time. We could instead calculate the difference
-	#for relevant edges, but Python seems to have some trouble with Floating Point subtraction 
-	#after only a few iterations.
-	def UpdateCost(self, first, second):
-		cost = 0
-		for i in range(len(self.path)-1):
-			cost += EuclideanCost(self.path[i], self.path[i+1])
-		self.cost = cost
+		self.UpdateCost(delta)
+
+	#SwapEdges: The edges (by index of their first city) touched by swapping two cities.
+	#A set, so that the shared edge of two adjacent cities is only counted once.
+	def SwapEdges(self, combo):
+		first = combo[0]
+		second = combo[1]
+		return {first-1, first, second-1, second}
+
+	#SwapDelta: The change in cost that swapping two cities would cause.
+	#Only the edges touching the two cities change, so only those are looked at.
+	def SwapDelta(self, combo):
+		first = combo[0]
+		second = combo[1]
+		edges = self.SwapEdges(combo)
+
+		before = 0
+		for e in edges:
+			before += Distance(self.path[e], self.path[e+1])
+
+		self.path[first], self.path[second] = self.path[second], self.path[first]
+		after = 0
+		for e in edges:
+			after += Distance(self.path[e], self.path[e+1])
+		self.path[first], self.path[second] = self.path[second], self.path[first]
+
+		return after - before
+
+	#ReverseDelta: The change in cost that reversing path[first..last] would cause.
+	#Only the two edges at either end of the segment change.
+	def ReverseDelta(self, first, last):
+		before = Distance(self.path[first-1], self.path[first]) + Distance(self.path[last], self.path[last+1])
+		after = Distance(self.path[first-1], self.path[last]) + Distance(self.path[first], self.path[last+1])
+		return after - before
+
+	#Reverse the segment path[first..last] (2-opt)
+	def ReverseSegment(self, first, last):
+		delta = self.ReverseDelta(first, last)
+		self.path[first:last+1] = self.path[first:last+1][::-1]
+		self.UpdateCost(delta)
+
+	#OrOptDelta: The change in cost that moving path[start..start+length-1] to sit between
+	#path[after] and path[after+1] would cause. Three edges are removed and three are added.
+	def OrOptDelta(self, start, length, after):
+		end = start + length - 1
+		removed = (Distance(self.path[start-1], self.path[start]) + Distance(self.path[end], self.path[end+1])
+			+ Distance(self.path[after], self.path[after+1]))
+		added = (Distance(self.path[start-1], self.path[end+1]) + Distance(self.path[after], self.path[start])
+			+ Distance(self.path[end], self.path[after+1]))
+		return added - removed
+
+	#Move the segment path[start..start+length-1] to sit after path[after] (Or-opt)
+	def MoveSegment(self, start, length, after):
+		delta = self.OrOptDelta(start, length, after)
+		segment = self.path[start:start+length]
+		del self.path[start:start+length]
+		if after > start:
+			after = after - length
+		self.path[after+1:after+1] = segment
+		self.UpdateCost(delta)
+
+	#MoveDelta: The change in cost of any kind of move
+	def MoveDelta(self, move):
+		if move[0] == SWAP:
+			return self.SwapDelta(move[1:])
+		elif move[0] == REVERSE:
+			return self.ReverseDelta(move[1], move[2])
+		else:
+			return self.OrOptDelta(move[1], move[2], move[3])
+
+	#ApplyMove: Make any kind of move on the path
+	def ApplyMove(self, move):
+		if move[0] == SWAP:
+			self.SwapCities(move[1:])
+		elif move[0] == REVERSE:
+			self.ReverseSegment(move[1], move[2])
+		else:
+			self.MoveSegment(move[1], move[2], move[3])
+
+	#PathCost: The cost of the whole path, summed from scratch
+	def PathCost(self):
+		return math.fsum(Distance(self.path[i], self.path[i+1]) for i in range(len(self.path)-1))
 
+	#Update the cost of our path by the change from a move.
+	#Note: Adding up deltas lets floating point error creep into the cost after many moves,
+	#so every RESUM_INTERVAL updates we throw the running total away and sum the path again.
+	def UpdateCost(self, delta):
+		self.updates += 1
+		if self.updates % RESUM_INTERVAL == 0:
+			self.cost = self.PathCost()
+		else:
+			self.cost = self.cost + delta
+
+#CoordinateCosts: Stands in for DistanceMatrix.Flat() on instances too big for a matrix.
+#Looking up flat[source*size + dest] computes the Euclidean cost from the coordinates.
+class CoordinateCosts:
+	def __init__(self, cities):
+		self.size = len(cities)
+		self.xs = [city.x for city in cities]
+		self.ys = [city.y for city in cities]
+
+	def __repr__(self):
+		return "CoordinateCosts: {} cities".format(self.size)
+
+	def __getitem__(self, k):
+		source, dest = divmod(k, self.size)
+		x = self.xs[source] - self.xs[dest]
+		y = self.ys[source] - self.ys[dest]
+		return math.sqrt((x*x)+(y*y))
+
+#ArrayTour: A Tour held as an array of city indices, for the batched annealing kernel.
+#Moves are scored straight from the flat distance matrix, many at a time, and applied
+#in place, so no objects are created for each step.
+#Cities without a DistanceMatrix are indexed by where they come in the tour instead,
+#and their costs are computed as they are looked up (see CoordinateCosts).
+class ArrayTour:
+	def __init__(self, tour):
+		matrix = tour.path[0].matrix
+		self.matrix = matrix
+		if matrix is not None:
+			self.cities = matrix.cities
+			self.size = matrix.size
+			self.flat = matrix.Flat()
+			self.order = array.array('i', [city.index for city in tour.path])
+		else:
+			self.cities = tour.path[:-1]
+			self.size = len(self.cities)
+			self.flat = CoordinateCosts(self.cities)
+			self.order = array.array('i', list(range(0, self.size)) + [0])
+		self.cost = tour.cost
+		self.updates = 0
+
+		#Where each city sits in the order. The start city sits at both ends; we keep 0.
+		self.positions = array.array('i', [0]) * self.size
+		for p in range(1, len(self.order)-1):
+			self.positions[self.order[p]] = p
+
+	#Neighbours: For each city index, the indices of its k nearest other cities, closest first
+	def Neighbours(self, k):
+		if self.matrix is not None:
+			return self.matrix.Neighbours(k)
+		return NearestNeighbourLists(self.cities, k)
+
+	#Path: The cities along the tour
+	def Path(self):
+		return [self.cities[i] for i in self.order]
+
+	#PathCost: The cost of the whole tour, summed from scratch
+	def PathCost(self):
+		order = self.order
+		n = self.size
+		return math.fsum(self.flat[order[i]*n + order[i+1]] for i in range(len(order)-1))
+
+	#ReverseDeltas: The change in cost of reversing order[first..last], for each pair of
+	#positions in firsts and lasts. Only the edges at either end of a segment change.
+	def ReverseDeltas(self, firsts, lasts):
+		order = self.order
+		flat = self.flat
+		n = self.size
+		return [flat[order[i-1]*n + order[j]] + flat[order[i]*n + order[j+1]]
+			- flat[order[i-1]*n + order[i]] - flat[order[j]*n + order[j+1]]
+			for i, j in zip(firsts, lasts)]
+
+	#SwapDeltas: The change in cost of swapping the cities at each pair of positions.
+	#Swapping neighbours is the same as reversing the two of them.
+	def SwapDeltas(self, firsts, seconds):
+		order = self.order
+		flat = self.flat
+		n = self.size
+		deltas = self.ReverseDeltas(firsts, seconds)
+		for k in range(len(deltas)):
+			i = firsts[k]
+			j = seconds[k]
+			if j - i > 1:
+				a, b, c = order[i-1], order[i], order[i+1]
+				d, e, f = order[j-1], order[j], order[j+1]
+				deltas[k] = (flat[a*n + e] + flat[e*n + c] + flat[d*n + b] + flat[b*n + f]
+					- flat[a*n + b] - flat[b*n + c] - flat[d*n + e] - flat[e*n + f])
+		return deltas
+
+	#NeighbourPairs: The (first, last) positions of 2-opt moves that each join a city at one of
+	#the given positions to one of its candidate neighbours. choices (each in [0, 1)) picks the
+	#neighbour, and which of the two 2-opt moves joining the pair is made. For a city at position i
+	#and a neighbour at position j > i, reversing [i+1..j] or [i..j-1] makes them adjacent
+	#(and [j..i-1] or [j+1..i] when j < i). The start city cannot be moved, so neighbours
+	#that are the start city give a move of length 0.
+	def NeighbourPairs(self, positions, choices, neighbours):
+		firsts = []
+		lasts = []
+		for p in range(0, len(positions)):
+			i = positions[p]
+			candidates = neighbours[self.order[i]]
+			choice = int(choices[p] * 2 * len(candidates))
+			j = self.positions[candidates[choice // 2]]
+			flip = choice % 2
+			if j > i:
+				firsts.append(i + 1 - flip)
+				lasts.append(j - flip)
+			elif j > 0:
+				firsts.append(j + flip)
+				lasts.append(i - 1 + flip)
+			else:
+				firsts.append(i)
+				lasts.append(i)
+		return (firsts, lasts)
+
+	#Reverse the segment order[first..last], whose change in cost is delta
+	def Reverse(self, first, last, delta):
+		self.order[first:last+1] = self.order[first:last+1][::-1]
+		for p in range(first, last+1):
+			self.positions[self.order[p]] = p
+		self.UpdateCost(delta)
+
+	#ReverseCycle: Reverse the cities from position first forward to position last, wrapping
+	#around the end of the tour if last < first. The start city has to stay at both ends,
+	#so if the segment holds it, the rest of the tour is reversed instead, which gives the same cycle.
+	def ReverseCycle(self, first, last, delta):
+		if 1 <= first <= last:
+			self.Reverse(first, last, delta)
+		elif first > last + 1:
+			self.Reverse(last + 1, first - 1, delta)
+		elif first == 0 and last < self.size - 1:
+			self.Reverse(last + 1, self.size - 1, delta)
+
+	#MoveSegment: Move order[start..start+length-1] to sit between order[after] and order[after+1],
+	#reversed if reverse is set (Or-opt). The segment must not hold the start city, and after must
+	#be outside of it. delta is the change in cost.
+	def MoveSegment(self, start, length, after, reverse, delta):
+		order = self.order
+		segment = order[start:start+length]
+		if reverse:
+			segment.reverse()
+		if after > start:
+			first, last = start, after
+			order[first:last+1] = order[start+length:after+1] + segment
+		else:
+			first, last = after + 1, start + length - 1
+			order[first:last+1] = segment + order[after+1:start]
+		for p in range(first, last+1):
+			self.positions[order[p]] = p
+		self.UpdateCost(delta)
+
+	#Swap the cities at two positions, whose change in cost is delta
+	def Swap(self, first, second, delta):
+		self.order[first], self.order[second] = self.order[second], self.order[first]
+		self.positions[self.order[first]] = first
+		self.positions[self.order[second]] = second
+		self.UpdateCost(delta)
+
+	#UpdateCost: As for Tour, re-summing every RESUM_INTERVAL updates to bound drift
+	def UpdateCost(self, delta):
+		self.updates += 1
+		if self.updates % RESUM_INTERVAL == 0:
+			self.cost = self.PathCost()
+		else:
+			self.cost = self.cost + delta
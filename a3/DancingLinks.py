@@ -0,0 +1,175 @@
+#CS486 Assignment #3, DancingLinks.py
+
+#Purpose: Solve a sudoku as an exact cover problem with Knuth's Algorithm X and dancing links.
+#There is a column for each constraint: every square has a value, and every row, column and
+#box has each value once, making 324 columns. There is a row for each choice of a value for
+#a square, covering one column of each kind. A solution is a set of rows covering every
+#column exactly once.
+#Each node of the matrix is doubly linked to its neighbours left/right and up/down, so a
+#column and its rows can be taken out and put back in the same order in O(1) per link.
+#The links are kept in flat lists indexed by node, the first 324 nodes being the column
+#headers and node 324 the root.
+#Assignments are counted as in SudokuSolver.Solve: once per value tried for a square,
+#not counting the givens.
+
+from SudokuObjects import *
+
+#Where each kind of constraint's columns start
+SQUARE_COLUMNS = 0
+ROW_COLUMNS = 81
+COLUMN_COLUMNS = 162
+BOX_COLUMNS = 243
+COLUMN_COUNT = 324
+
+#ChoiceColumns: The four columns covered by putting value in square k
+def ChoiceColumns(k, value):
+	return (SQUARE_COLUMNS + k,
+			ROW_COLUMNS + (k // 9)*9 + value-1,
+			COLUMN_COLUMNS + (k % 9)*9 + value-1,
+			BOX_COLUMNS + BOX_OF[k]*9 + value-1)
+
+#DancingLinks: The exact cover matrix for a sudoku, and Algorithm X over it
+class DancingLinks:
+	def __init__(self):
+		root = COLUMN_COUNT
+		self.root = root
+		self.left = [c-1 for c in range(0, COLUMN_COUNT+1)]
+		self.right = [c+1 for c in range(0, COLUMN_COUNT+1)]
+		self.left[0] = root
+		self.right[root] = 0
+		self.up = list(range(0, COLUMN_COUNT+1))
+		self.down = list(range(0, COLUMN_COUNT+1))
+		self.column = list(range(0, COLUMN_COUNT+1))
+		self.choice = [None] * (COLUMN_COUNT+1)
+		self.size = [0] * COLUMN_COUNT
+
+		#(square, value) of the rows picked so far, and how many were tried
+		self.solution = []
+		self.assignments = 0
+		self.limit = None
+
+		for k in range(0, 81):
+			for value in range(1, 10):
+				self.AddRow((k, value), ChoiceColumns(k, value))
+
+	def __repr__(self):
+		return "DancingLinks: {} rows picked, {} assignments".format(len(self.solution), self.assignments)
+
+	#AddRow: Add a row for a choice, covering the given columns, to the bottom of the matrix.
+	#Returns its first node.
+	def AddRow(self, choice, columns):
+		first = len(self.column)
+		for n, c in enumerate(columns):
+			node = first + n
+			self.left.append(first + (n-1) % len(columns))
+			self.right.append(first + (n+1) % len(columns))
+			self.up.append(self.up[c])
+			self.down.append(c)
+			self.down[self.up[c]] = node
+			self.up[c] = node
+			self.column.append(c)
+			self.choice.append(choice)
+			self.size[c] += 1
+		return first
+
+	#Cover: Take column c out of the header list, and every row with a node in c out of the
+	#other columns
+	def Cover(self, c):
+		left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+		right[left[c]] = right[c]
+		left[right[c]] = left[c]
+		i = down[c]
+		while i != c:
+			j = right[i]
+			while j != i:
+				down[up[j]] = down[j]
+				up[down[j]] = up[j]
+				size[column[j]] -= 1
+				j = right[j]
+			i = down[i]
+
+	#Uncover: Put column c back, undoing Cover in the reverse order
+	def Uncover(self, c):
+		left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+		i = up[c]
+		while i != c:
+			j = left[i]
+			while j != i:
+				size[column[j]] += 1
+				down[up[j]] = j
+				up[down[j]] = j
+				j = left[j]
+			i = up[i]
+		right[left[c]] = c
+		left[right[c]] = c
+
+	#Place: Pick value for square k before searching, as for a given.
+	#Returns False if a square, row, column or box already has what it would cover.
+	def Place(self, k, value):
+		columns = ChoiceColumns(k, value)
+		for c in columns:
+			if self.left[self.right[c]] != c:
+				return False
+		for c in columns:
+			self.Cover(c)
+		self.solution.append((k, value))
+		return True
+
+	#Search: Algorithm X. Cover the column with the fewest rows left, then try each of its
+	#rows in turn, covering the other columns of that row. True once every column is covered;
+	#False if there is no solution from here, or the assignment limit was reached.
+	def Search(self):
+		right, down = self.right, self.down
+		if right[self.root] == self.root:
+			return True
+
+		#The column with the fewest rows left, as the MRV heuristic does
+		c = right[self.root]
+		best = c
+		while c != self.root:
+			if self.size[c] < self.size[best]:
+				best = c
+			c = right[c]
+		c = best
+		if self.size[c] == 0:
+			return False
+
+		self.Cover(c)
+		r = down[c]
+		while r != c and self.assignments != self.limit:
+			self.assignments += 1
+			self.solution.append(self.choice[r])
+			j = right[r]
+			while j != r:
+				self.Cover(self.column[j])
+				j = right[j]
+
+			if self.Search():
+				return True
+
+			j = self.left[r]
+			while j != r:
+				self.Uncover(self.column[j])
+				j = self.left[j]
+			self.solution.pop()
+			r = down[r]
+		self.Uncover(c)
+		return False
+
+#SolveExactCover: Solve the board with dancing links, filling in the squares if a solution
+#is found. limit caps the number of assignments, as the backtracking solver's give up does;
+#by default there is no cap. Returns the number of assignments made.
+def SolveExactCover(board, limit=None):
+	links = DancingLinks()
+	links.limit = limit
+
+	placed = all(links.Place(k, board.values[k]) for k in range(0, 81) if board.values[k] != 0)
+	if placed and links.Search():
+		for k, value in links.solution:
+			if board.values[k] == 0:
+				board.Update(k // 9, k % 9, value)
+		print("FIN")
+	else:
+		print("GIVE UP")
+
+	return links.assignments
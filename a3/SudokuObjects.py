@@ -3,54 +3,87 @@
 #20375706
 
 #Provides objects used for the grid and for solving the sudoku puzzle
+#The board keeps its state in flat arrays of 81 cells, indexed by row*9 + column:
+#	values: the value of each square, or 0 if it is unassigned
+#	candidates: the values each square can still take, as a 9-bit mask (bit v-1 for value v)
+#	trail: (square, old value, old candidates) for every change the solver makes, so it can undo them
+#	marks: where on the trail each of the solver's assignments starts
+import array
 
-#Entry: A singular cell in the game board.
-#Contains the value (if assigned) and the possible remaining values
-import copy
+#All nine values, as a mask
+ALL_VALUES = 0x1FF
+
+#BIT[v]: The mask of the single value v. BIT[0] is 0, so removing "no value" does nothing.
+BIT = [0] + [1 << (v-1) for v in range(1, 10)]
+
+#POPCOUNT[mask]: How many values are in a mask
+POPCOUNT = [bin(mask).count("1") for mask in range(0, 512)]
+
+#VALUES[mask]: The values in a mask, smallest first
+VALUES = [[v for v in range(1, 10) if mask & BIT[v]] for mask in range(0, 512)]
+
+######Row/Column/Box Tables######
+#Built once, since the shape of the board never changes
+ROWS = [[row*9 + col for col in range(9)] for row in range(9)]
+COLUMNS = [[row*9 + col for row in range(9)] for col in range(9)]
+BOXES = [[x*9 + y for x in range(r, r+3) for y in range(c, c+3)] for r in range(0, 9, 3) for c in range(0, 9, 3)]
+
+#UNITS: The 27 rows, columns and boxes
+UNITS = ROWS + COLUMNS + BOXES
 
+#BOX_OF[k]: Which box square k is in
+BOX_OF = [(k // 27) * 3 + (k % 9) // 3 for k in range(81)]
+
+#PEERS[k]: The 20 other squares that share a row, column or box with square k
+PEERS = [sorted(set(ROWS[k // 9] + COLUMNS[k % 9] + BOXES[BOX_OF[k]]) - {k}) for k in range(81)]
+
+#BOX_LINE_PEERS[k]: The 4 other squares in k's box that are also in its row or column.
+#The constraint counts used to pick squares and values count these twice, once for the
+#line and once for the box, so PEERS + BOX_LINE_PEERS are all the neighbours counted that way.
+BOX_LINE_PEERS = [[p for p in BOXES[BOX_OF[k]] if p != k and (p // 9 == k // 9 or p % 9 == k % 9)] for k in range(81)]
+######End Row/Column/Box Tables######
+
+#Entry: A singular cell in the game board.
+#A view onto one square of a Board: the value (if assigned) and the possible remaining values
+#are read from and written to the board's arrays.
 class Entry:
-	def __init__(self, value, i, j):
-		self.i = i #ROW
-		self.j = j #COL
-		self.assigned = []
-		if value == 0:
-			self.value = 0
-			self.possibilities = list(range(1, 10))
-		else:
-			self.value = value
-			self.possibilities = []
-			self.assigned.append(value)
+	__slots__ = ("board", "index", "i", "j")
+
+	def __init__(self, board, i, j):
+		self.board = board
+		self.i = i #COL
+		self.j = j #ROW
+		self.index = j*9 + i
+
+	@property
+	def value(self):
+		return self.board.values[self.index]
+
+	#mask: The possible remaining values, as a mask
+	@property
+	def mask(self):
+		return self.board.candidates[self.index]
+
+	@property
+	def possibilities(self):
+		return list(VALUES[self.board.candidates[self.index]])
+
+	#Count: The number of possible remaining values
+	def Count(self):
+		return POPCOUNT[self.board.candidates[self.index]]
 
 	#Remove: Remove a value from possible values
 	def Remove(self, value):
-		if value in self.possibilities:
-			self.possibilities.remove(value)
-
-	#Reset: Reset the assigned values and set new options
-	def Reset(self, possibilities):
-		self.possibilities = list(possibilities)
-		self.assigned = []
+		self.board.candidates[self.index] &= ~BIT[value]
 
 	#Update: Update a square in the board with a non-zero value
 	def Update(self, value):
 		if value != 0:	
-			self.value = value
-			self.possibilities = []
-			self.assigned.append(value)
-
-	#AddPossibility: add an option to this square if we haven't tried it before
-	def AddPossibility(self, value):
-		if value not in self.possibilities and value not in self.assigned:
-			self.possibilities.append(value)
-			self.possibilities = sorted(self.possibilities)
-
-	#Restore: Restore a square to zero, and add options that we haven't tried yet
-	def Restore(self, possibilities):
-		self.value = 0
-		self.possibilities = [p for p in possibilities if p not in self.assigned]
+			self.board.values[self.index] = value
+			self.board.candidates[self.index] = 0
 
 	def __contains__(self, value):
-		return value in self.possibilities
+		return bool(self.board.candidates[self.index] & BIT[value])
 
 	def __eq__(self, other):
 		return (self.i == other.i) and (self.j == other.j)
@@ -59,16 +92,29 @@ class Entry:
 		return not self == other
 
 	def __repr__(self):
-		#return "{}, {}: {} -> {}".format(self.j, self.i, self.value, self.possibilities) + '\n'
 		return str(self.value)	
 
-#Board: The entry game board. Contains a 2D list of Entry objects		
+#Board: The entry game board. Holds the arrays of values and candidates, and a 2D list
+#of Entry objects onto them (spaces[row][col])
+#Every change the solver makes goes on the trail as (square, old value, old candidates), and
+#marks holds where each assignment's changes start on it, so Undo takes the last assignment
+#back by putting those squares back as they were.
 class Board:
 	def __init__(self, other=None):
 		if other:
+			self.values = other.values
+			self.candidates = other.candidates
+			self.entries = other.entries
 			self.spaces = other.spaces
+			self.trail = other.trail
+			self.marks = other.marks
 		else:
-			self.spaces = [[Entry(0, i, j) for i in range(9)] for j in range(9)]
+			self.values = array.array('B', [0]) * 81
+			self.candidates = array.array('H', [ALL_VALUES]) * 81
+			self.spaces = [[Entry(self, i, j) for i in range(9)] for j in range(9)]
+			self.entries = [entry for row in self.spaces for entry in row]
+			self.trail = []
+			self.marks = []
 
 	######Rows/Column/Box Operations######
 	def Rows(self):
@@ -78,83 +124,72 @@ class Board:
 		return [list(x) for x in zip(*self.spaces)]
 
 	def Boxes(self):
-		boxStarts = [(0,0), (0,3), (0, 6), (3, 0), (3, 3), (3, 6), (6, 0), (6, 3), (6, 6)]
-		boxes = []
-		for start in boxStarts:
-			box = []
-			for x in range(start[0], start[0]+3):
-				for y in range(start[1], start[1]+3):
-					box.append(self.spaces[x][y])
-			boxes.append(box)
-		return boxes
+		return [[self.entries[k] for k in box] for box in BOXES]
 
 	def FindRow(self, i, j):
 		return self.spaces[i]
 
 	def FindColumn(self, i, j):
-		return [list(x) for x in zip(*self.spaces)][j]
+		return [self.entries[k] for k in COLUMNS[j]]
 
 	def FindBox(self, i, j):
-		boxStarts = [(0,0), (0,3), (0, 6), (3, 0), (3, 3), (3, 6), (6, 0), (6, 3), (6, 6)]
-		box = []
-		for start in boxStarts:
-			if (i >= start[0] and i <= start[0]+2) and (j >= start[1] and j <= start[1]+2):			
-				for x in range(start[0], start[0]+3):
-					for y in range(start[1], start[1]+3):
-						box.append(self.spaces[x][y])
-				return box
+		return [self.entries[k] for k in BOXES[BOX_OF[i*9 + j]]]
 
 	def FindEntry(self, i, j):
 		return self.spaces[i][j]
 
+	#FindNeighbours: The 20 squares sharing a row, column or box with an entry
 	def FindNeighbours(self, entry):
-		row = self.FindRow(entry.j, entry.i)
-		col = self.FindColumn(entry.j, entry.i)
-		box = self.FindBox(entry.j, entry.i)
-		return row + col + box
+		return [self.entries[k] for k in PEERS[entry.index]]
 	###### End Rows/Column/Box Operations######
 
+	#Remove: Rule a value out for a square. Undone along with the last assignment.
 	def Remove(self, i, j, value):
-		self.spaces[i][j].Remove(value)
-
-	def Restore(self, entry):
-		self.RestoreConstraints(entry)
+		entry = self.spaces[i][j]
+		if entry.mask & BIT[value]:
+			self.trail.append((entry.index, entry.value, entry.mask))
+			entry.Remove(value)
 
 	#Update: Update a square and propogate this change through the constraints
 	def Update(self, i, j, value):
-		self.spaces[i][j].Update(value)
-		self.PropogateConstraints(self.spaces[i][j])
-
-	#Reset an entry in the board. This requires us to find possible values for this entry
-	def Reset(self, entry):
-		constraints = self.FindNeighbours(entry)
-		possibilities = list(range(1, 10))
-		if entry.value in possibilities:
-			possibilities.remove(entry.value)
-
-		for c in constraints:
-			if c.value != 0 and c != entry and c.value in possibilities:
-				possibilities.remove(c.value)
-
-		entry.Reset(possibilities)
+		entry = self.spaces[i][j]
+		self.marks.append(len(self.trail))
+		self.trail.append((entry.index, entry.value, entry.mask))
+		entry.Update(value)
+		self.PropogateConstraints(entry)
+
+	#Undo: Take back the last assignment, and everything removed since it was made
+	def Undo(self):
+		mark = self.marks.pop()
+		values = self.values
+		candidates = self.candidates
+		trail = self.trail
+		while len(trail) > mark:
+			k, value, mask = trail.pop()
+			values[k] = value
+			candidates[k] = mask
+
+	#Commit: Forget the trail, as what has been done so far can no longer be undone
+	def Commit(self):
+		self.trail = []
+		self.marks = []
  
  	#Find the least constraining value in an squares possible moves
  	#If we return None, then our solver will backtrack
 	def LeastConstrainingValue(self, entry):
-		constraints = self.FindNeighbours(entry)
+		candidates = self.candidates
+		neighbours = PEERS[entry.index] + BOX_LINE_PEERS[entry.index]
 
 		maxTotal = 100
 		maxValue = None
 
 		for p in entry.possibilities:
 			if not self.ForwardCheck(entry, p):
-				entry.Remove(p)
+				self.Remove(entry.j, entry.i, p)
 				continue
-				
-			total = 0
-			for c in constraints:
-				if p in c.possibilities and c != entry:
-					total += 1
+
+			#How many neighbours could also take p: each adds BIT[p] to the sum
+			total = sum(candidates[k] & BIT[p] for k in neighbours) >> (p-1)
 
 			if total < maxTotal:
 				maxTotal = total
@@ -167,123 +202,74 @@ class Board:
 	#We can check and backtrack early if we notice bad gunk at this stage, namely if
 	#there is a square with no possible values.
 	def MostConstrainedEntry(self):
-		most = self.spaces[0][0]
-		for i in range(0, 9):
-			for j in range(0, 9):
-				entry = self.spaces[i][j]
-				if not entry.possibilities and entry.value == 0:
-					return entry
-				if not most.possibilities or (len(entry.possibilities) > 0 and len(entry.possibilities) < len(most.possibilities)):
-					most = entry
-
-		mostConstrained = [most]
-		for i in range(0, 9):
-			for j in range(0, 9):
-				entry = self.spaces[i][j]
-				if entry not in mostConstrained and (len(entry.possibilities) > 0 and len(entry.possibilities) == len(most.possibilities)):
-					mostConstrained.append(entry)
+		values = self.values
+		counts = [POPCOUNT[mask] for mask in self.candidates]
+
+		most = 0
+		for k in range(0, 81):
+			if counts[k] == 0 and values[k] == 0:
+				return self.entries[k]
+			if counts[most] == 0 or (counts[k] > 0 and counts[k] < counts[most]):
+				most = k
+
+		mostConstrained = [most] + [k for k in range(0, 81) if k != most and counts[k] > 0 and counts[k] == counts[most]]
 
 		#Find Most Constraining Variable - Tiebreak
 		if len(mostConstrained) > 1:
 			best = mostConstrained[0]
 			leastNeighbours = 0
 			for e in mostConstrained:
-				constraints = self.FindNeighbours(e)
-
-				unassignedNeighbours = 0
-				for c in constraints:	
-					if c != e and c.value == 0:
-						unassignedNeighbours += 1
-
+				unassignedNeighbours = sum(1 for k in PEERS[e] if values[k] == 0) + sum(1 for k in BOX_LINE_PEERS[e] if values[k] == 0)
 				if unassignedNeighbours >= leastNeighbours:
 					leastNeighbours = unassignedNeighbours
 					best = e
-			return best
+			return self.entries[best]
 		else:
-			return most
+			return self.entries[most]
 
 	#PropogateConstraints: When we assign a value to a square, we need to 
 	#update the neighbouring squares so they can no longer use this value
 	def PropogateConstraints(self, entry):
-		constraints = self.FindNeighbours(entry)
-
-		for e in constraints:
-			e.Remove(entry.value)
-
-	#RestoreConstraints: On backtrack, we need to restore possible values to this square
-	#We can do this by examining what our neighbours allow us to choose. We also have to 
-	#restore values to neighbours squares by checking their neighbours
-	def RestoreConstraints(self, entry):
-		possibilities = list(range(1, 10))
-		possibilities.remove(entry.value)
-		constraints = self.FindNeighbours(entry)
-
-		for square in constraints:
-			if square == entry:
-				continue
-			#If any of my neighbours has an assigned value, I cannot have that value myself
-			if square.value != 0 and square.value in possibilities:
-				possibilities.remove(square.value)
-			#Unassigned and they haven't touched my value yet
-			elif square.value == 0 and entry.value not in square.possibilities and entry.value not in square.assigned:
-				#Get their neighbours
-				nconstraints = self.FindNeighbours(square)
-				inNeighbour = False
-				for c in nconstraints:
-					if c != entry and c.value == entry.value:
-						inNeighbour = True
-				if not inNeighbour:
-					square.AddPossibility(entry.value)
-		entry.Restore(possibilities)
+		values = self.values
+		candidates = self.candidates
+		trail = self.trail
+		bit = BIT[entry.value]
+		for k in PEERS[entry.index]:
+			if candidates[k] & bit:
+				trail.append((k, values[k], candidates[k]))
+				candidates[k] &= ~bit
 
 	#AllDiff Constraints on the rows, boxes and columns. Only true if a puzzle is complete
 	def IsComplete(self):
-		for row in self.Rows():
-			l = [i.value for i in row]
-			if not AllDiff(l):
-				return False
-		for col in self.Columns():
-			l = [i.value for i in col]
-			if not AllDiff(l):
-				return False
-		for box in self.Boxes():
-			l = [i.value for i in box]
-			if not AllDiff(l):
+		values = self.values
+		for unit in UNITS:
+			seen = 0
+			for k in unit:
+				seen |= BIT[values[k]]
+			if seen != ALL_VALUES:
 				return False
 		return True
 
-	def IsValid(self):
-		for row in self.Rows():
-			l = [i.value for i in row]
-			if not ValidRBC(l):
-				return False
-			for s in row:
-				if s.value == 0 and len(s.possibilities) == 0:
-					return False
-		for col in self.Columns():
-			l = [i.value for i in col]
-			if not ValidRBC(l):
+	#ForwardCheck: Would assigning value to entry leave every unit without repeats and
+	#every unassigned square with a possible value? Only the entry's peers change, so only they
+	#are checked. The rest of the board is already consistent: ConstructBoard checks the givens,
+	#values are only assigned from a square's candidates, and the solver backtracks as soon as
+	#MostConstrainedEntry finds an unassigned square with none left.
+	def ForwardCheck(self, entry, value):
+		return self.PeersAllow(entry.index, value)
+
+	#PeersAllow: Whether square k could take value as far as its peers go: none of them has
+	#the value already, and every unassigned one has another possible value
+	def PeersAllow(self, k, value):
+		values = self.values
+		candidates = self.candidates
+		clear = ~BIT[value]
+		for p in PEERS[k]:
+			v = values[p]
+			if v == value:
 				return False
-			for s in col:
-				if s.value == 0 and len(s.possibilities) == 0:
-					return False
-		for box in self.Boxes():
-			l = [i.value for i in box]
-			if not ValidRBC(l):
+			if v == 0 and not candidates[p] & clear:
 				return False
-			for s in box:
-				if s.value == 0 and len(s.possibilities) == 0:
-					return False
-		return True
-
-	def ForwardCheck(self, entry, value):
-		testBoard = copy.deepcopy(self)
-		testEntry = copy.deepcopy(entry)
-		testBoard.Update(testEntry.j, testEntry.i, value)
-
-		if not testBoard.IsValid():
-			return False
-
 		return True
 
 	def __repr__(self):
@@ -300,6 +286,13 @@ def ConstructBoard(filename, size):
 		for j in range(0, size):
 			entry = board.spaces[i][j]
 			board.Update(i, j, int(row[j]))
+
+	#The solver counts on the givens being consistent (see Board.ForwardCheck)
+	if not all(ValidRBC([board.values[k] for k in unit]) for unit in UNITS):
+		raise ValueError("{}: a row, column or box repeats a value".format(filename))
+
+	#The givens are never undone
+	board.Commit()
 	return board
 
 #All unique values in l and values are 1-9
@@ -7,8 +7,7 @@
 
 import sys, string, math
 from SudokuObjects import *
-#NOTE: In some of the failing puzzles, the possible entries are
-#slightly incorrect for some squares
+from DancingLinks import SolveExactCover
 
 def Solve(board):
 	assignments = 0
@@ -21,47 +20,48 @@ def Solve(board):
 			print("FIN")
 			break
 
-		#Step One: Find the MRV, breaking if we have backed up
-		#to the point where there are no possible moves
+		#Step One: Find the MRV. We backtrack if it is unassigned and has no possible moves
 		entry = board.MostConstrainedEntry()
-		if not moves and assignments > 0 and len(entry.possibilities) == 0:
-			print("GIVE UP")
-			assignments = 10000
-			break
+		leastConstrainingValue = None
+		if entry.Count() > 0 or entry.value != 0:
+			#Step Two: Find the least constraining value for that entry,
+			#If there is none, then we backtrack
+			leastConstrainingValue = board.LeastConstrainingValue(entry)
 
-		#We backtrack if our MRV is unassigned and has no possible moves
-		if len(entry.possibilities) == 0 and entry.value == 0:
-			badMove = moves.pop()
-			board.Restore(badMove)
-			if len(entry.possibilities) == 0:
-				board.Reset(badMove)
-			continue
+		if not leastConstrainingValue:
+			#Give up if we have backed up to the point where there are no possible moves
+			if not moves:
+				print("GIVE UP")
+				assignments = 10000
+				break
 
-		#Step Two: Find the least constraining value for that entry,
-		#If it is 0 (unassigned), then we backtrack
-		leastConstrainingValue = board.LeastConstrainingValue(entry)
-		if not leastConstrainingValue or leastConstrainingValue == 0:
-			badMove = moves.pop()
-			board.Restore(badMove)
-			if len(entry.possibilities) == 0:
-				board.Reset(badMove)
+			#Undo the last move, and rule its value out for that square
+			badMove, badValue = moves.pop()
+			board.Undo()
+			board.Remove(badMove.j, badMove.i, badValue)
 			continue
 
 		#Step Three: Make the assignment, put the move on our stack
 		#and increment the assignments
 		board.Update(entry.j, entry.i, leastConstrainingValue)
-		moves.append(entry)
+		moves.append((entry, leastConstrainingValue))
 		assignments += 1
 
 	return assignments
 
-def sudoku(filename):
+#Solvers by name: the MRV/LCV backtracker, and dancing links
+ENGINES = {
+	"backtrack": Solve,
+	"dlx": SolveExactCover,
+}
+
+def sudoku(filename, engine="backtrack"):
 	# if len(sys.argv) == 2:							
 	# 	filename = sys.argv[1]
 	board = ConstructBoard(filename, 9)
 	print("Starting board:")
 	print(board)
-	assignments = Solve(board)
+	assignments = ENGINES[engine](board)
 	print("Final board:")
 	print(board)
 	print("Assignments made: {}".format(assignments))
@@ -1,12 +1,15 @@
 import sys, string, math, os
 from SudokuSolver import *
 
+#The engine to run, from SudokuSolver.ENGINES
+engine = sys.argv[1] if len(sys.argv) > 1 else "backtrack"
+
 result = open('results.txt', 'w')
 for folder in range(1, 72):
 	total = 0
 	giveup = 0
 	for puzzle in range (1, 11):
-		assignments = sudoku("problems\{}\{}.sd".format(folder, puzzle))
+		assignments = sudoku("problems\{}\{}.sd".format(folder, puzzle), engine)
 		total += assignments
 		if assignments == 10000:
 			giveup += 1